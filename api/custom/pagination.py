@@ -0,0 +1,123 @@
+import base64
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.models.custom.search import search
+
+
+class KeysetCursorPagination(pagination.BasePagination):
+    """
+    Cursor pagination on `(updated_at, id)`, most recently updated first.
+    Every page is one range scan of the matching index whatever its depth,
+    without `OFFSET` or `COUNT(*)`.
+    """
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering = ("-updated_at", "-id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    @staticmethod
+    def encode_cursor(obj):
+        position = f'{obj.updated_at.isoformat()}|{obj.pk}'
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = base64.urlsafe_b64decode(cursor.encode()).decode()
+            updated_at, pk = position.split("|")
+            updated_at, pk = parse_datetime(updated_at), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if updated_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return updated_at, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position:
+            updated_at, pk = position
+            # rows after the cursor, first condition bounds the index range
+            queryset = queryset.filter(
+                Q(updated_at__lte=updated_at)
+                & (Q(updated_at__lt=updated_at) | Q(pk__lt=pk))
+            )
+        rows = list(queryset[:page_size + 1])
+        self.page = rows[:page_size]
+        self.has_next = len(rows) > page_size
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class SearchPagination(KeysetCursorPagination):
+    """
+    Offset pagination of ranked full text search hits, see
+    `core.models.custom.search`. Ranks give no keyset to resume from, but
+    relevant hits come first and are rarely paged deep.
+    """
+    page_size = 20
+    max_page_size = 100
+    offset_query_param = "offset"
+    invalid_offset_message = "Invalid offset"
+
+    def get_offset(self, request):
+        try:
+            offset = int(request.query_params.get(self.offset_query_param, 0))
+        except ValueError:
+            raise NotFound(self.invalid_offset_message)
+        if offset < 0:
+            raise NotFound(self.invalid_offset_message)
+        return offset
+
+    def paginate_search(self, queryset, query, request):
+        self.request = request
+        self.limit = self.get_page_size(request)
+        self.offset = self.get_offset(request)
+        rows = search(queryset, query, self.limit + 1, self.offset)
+        self.page = rows[:self.limit]
+        self.has_next = len(rows) > self.limit
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.offset_query_param,
+            self.offset + self.limit)
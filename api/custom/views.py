@@ -1,15 +1,269 @@
-from rest_framework import viewsets
+from django.core.exceptions import (
+    FieldDoesNotExist, ObjectDoesNotExist, ValidationError as DjVE,
+)
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError as DrfVE
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
+from api.custom import pagination as custom_pagination
+from api.serializers import custom_classes as custom_serializers
+from core.models.custom.delete import delete_in_chunks
 
-class CustomBaseModelViewSet(viewsets.ModelViewSet):
+
+class QueryPlanMixin():
+    """
+    Declarative query plan of read actions, so they run a constant number
+    of queries whatever the number of rows. Relations serialized through
+    related objects are joined (`plan_select_related`) or prefetched
+    (`plan_prefetch_related`), and columns are limited with `only()` to
+    those of serializer fields and `plan_only_extra`.
+    """
+    plan_actions = {"list", "retrieve"}
+    plan_select_related = []
+    plan_prefetch_related = []
+    plan_only_extra = []
+
+    def get_plan_only_fields(self):
+        model = self.serializer_class.Meta.model
+        field_names = {model._meta.pk.name, *self.plan_only_extra}
+        # joined relations are traversed from their foreign key
+        field_names.update(
+            name.split("__")[0] for name in self.plan_select_related)
+        for field in self.get_serializer_class()().fields.values():
+            if field.write_only or field.source == "*" or "." in field.source:
+                continue
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete and not model_field.many_to_many:
+                field_names.add(model_field.name)
+        return sorted(field_names)
+
+    def apply_query_plan(self, queryset, force=False):
+        """
+        Applies plan to queryset of a read action, or always with `force`.
+        """
+        if not force and getattr(self, "action", None) not in self.plan_actions:
+            return queryset
+        if self.plan_select_related:
+            # without arguments `select_related` would join every relation
+            queryset = queryset.select_related(*self.plan_select_related)
+        return queryset.prefetch_related(
+            *self.plan_prefetch_related,
+        ).only(*self.get_plan_only_fields())
+
+
+class CustomBaseModelViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     def get_queryset(self):
-        return self.serializer_class.Meta.model.objects.filter(
-            created_by=self.kwargs["user_id"],
-        )
+        return self.apply_query_plan(
+            self.serializer_class.Meta.model.objects.filter(
+                created_by=self.kwargs["user_id"],
+            ))
 
 
-class CustomBaseModelViewSetUser(viewsets.ModelViewSet):
+class CustomBaseModelViewSetUser(QueryPlanMixin, viewsets.ModelViewSet):
+    # denormalized workspace owner, see `WorkspaceOwnerMixin`
+    owner_lookup = "owner"
+
     def get_queryset(self):
-        return self.serializer_class.Meta.model.objects.filter(
-            workspace__created_by=self.kwargs["user_id"],
+        return self.apply_query_plan(
+            self.serializer_class.Meta.model.objects.filter(**{
+                self.owner_lookup: self.kwargs["user_id"],
+            }))
+
+    @action(detail=False, methods=["post"], url_path="bulk-create")
+    def bulk_create(self, request, *args, **kwargs):
+        """
+        Creates a list of items in one transaction, or none of them with
+        per item errors if any is invalid.
+        """
+        if not isinstance(request.data, list):
+            raise DrfVE({"non_field_errors": ["Expected a list of items."]})
+        serializer = custom_serializers.BulkListSerializer(
+            child=self.get_serializer_class()(),
+            data=request.data,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        instances = serializer.save()
+        return self.get_bulk_response(instances, status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["patch"], url_path="bulk-update")
+    def bulk_update(self, request, *args, **kwargs):
+        """
+        Partially updates a list of `{"id": pk, "fields": {...}}` items in
+        one transaction, or none of them with per item errors if any is
+        invalid.
+        """
+        items = request.data
+        if not isinstance(items, list) or not all(
+                isinstance(item, dict) and isinstance(item.get("fields"), dict)
+                for item in items):
+            raise DrfVE({"non_field_errors": [
+                'Expected a list of {"id": pk, "fields": {...}} items.']})
+        model = self.serializer_class.Meta.model
+        pks = []
+        for item in items:
+            try:
+                pks.append(model._meta.pk.to_python(item.get("id")))
+            except DjVE:
+                pks.append(None)
+        instances = self.get_queryset().in_bulk(
+            {pk for pk in pks if pk is not None})
+        errors = []
+        for index, (item, pk) in enumerate(zip(items, pks)):
+            if pk not in instances:
+                errors.append({"id": [
+                    f'Invalid pk "{item.get("id")}" - object does not exist.']})
+            elif pk in pks[:index]:
+                errors.append({"id": [f'Duplicate pk "{pk}".']})
+            else:
+                errors.append({})
+        if any(errors):
+            raise DrfVE(errors)
+        serializer = custom_serializers.BulkListSerializer(
+            child=self.get_serializer_class()(),
+            context=self.get_serializer_context(),
         )
+        instances = serializer.bulk_update(
+            [instances[pk] for pk in pks], [item["fields"] for item in items])
+        return self.get_bulk_response(instances, status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="bulk-delete")
+    def bulk_delete(self, request, *args, **kwargs):
+        """
+        Deletes all objects matching filter criteria, e.g.
+        `{"workspace": 1, "status__in": [3, 4]}`, in bounded chunks.
+        """
+        criteria = request.data
+        if not isinstance(criteria, dict) or not criteria:
+            raise DrfVE({"non_field_errors": ["Expected filter criteria."]})
+        model = self.serializer_class.Meta.model
+        field_names = {
+            name for field in model._meta.concrete_fields
+            for name in (field.name, field.attname)
+        } | {"id"}
+        filters = {}
+        for key, value in criteria.items():
+            name, _, lookup = key.partition("__")
+            if name not in field_names or lookup not in ("", "in"):
+                raise DrfVE({key: ["Unknown filter."]})
+            if lookup == "in" and not isinstance(value, list):
+                raise DrfVE({key: ["Expected a list."]})
+            filters[key] = value
+        try:
+            queryset = self.get_queryset().filter(**filters)
+            count, counts = delete_in_chunks(queryset)
+        except (DjVE, ValueError, TypeError) as e:
+            raise DrfVE(e)
+        return Response({"deleted": count, "deleted_by_model": counts})
+
+    def get_bulk_response(self, instances, status_code):
+        queryset = self.apply_query_plan(self.get_queryset().filter(
+            pk__in=[instance.pk for instance in instances],
+        ), force=True).order_by("pk")
+        return Response(self.get_serializer(queryset, many=True).data,
+                        status=status_code)
+
+
+class TreeModelViewSetMixin():
+    """
+    Adds `tree` endpoint returning nested subtree of an object, for
+    viewsets of `TreeMixin` models.
+
+    Updates whose cascade was queued as `CascadeJob` respond with
+    `202 Accepted` and the jobs' poll urls in `cascade_jobs`.
+    """
+    plan_actions = {"list", "retrieve", "tree"}
+    plan_only_extra = ["tree_path"]
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.cascade_jobs = getattr(serializer.instance, "cascade_jobs", [])
+
+    def update(self, request, *args, **kwargs):
+        self.cascade_jobs = []
+        response = super().update(request, *args, **kwargs)
+        if self.cascade_jobs:
+            response.status_code = status.HTTP_202_ACCEPTED
+            response.data["cascade_jobs"] = [{
+                "id": job.pk,
+                "status": job.status,
+                "url": reverse("api:user-cascade-job-detail", kwargs={
+                    "user_id": self.kwargs["user_id"], "pk": job.pk,
+                }, request=request),
+            } for job in self.cascade_jobs]
+        return response
+
+    def get_tree_depth(self):
+        depth = self.request.query_params.get("depth")
+        if depth in (None, ""):
+            return None
+        try:
+            depth = int(depth)
+        except ValueError:
+            depth = -1
+        if depth < 0:
+            raise DrfVE({"depth": "Depth should be a non negative integer."})
+        return depth
+
+    @action(detail=True, methods=["get"])
+    def tree(self, request, *args, **kwargs):
+        obj = self.get_object()
+        model = self.serializer_class.Meta.model
+        descendants = model.get_descendants(
+            [obj], depth=self.get_tree_depth())
+        nodes = [obj, *self.apply_query_plan(descendants)]
+        data = self.get_serializer(nodes, many=True).data
+        # nodes are ordered by tree path, parents come before children
+        items = {}
+        for node, node_data in zip(nodes, data):
+            items[node.pk] = {**node_data, "children": []}
+            if node is not obj:
+                items[node.parent_id]["children"].append(items[node.pk])
+        return Response(items[obj.pk])
+
+    @action(detail=True, methods=["post"])
+    def move(self, request, *args, **kwargs):
+        """
+        Moves object with its subtree under `parent` (or to root if empty).
+        """
+        obj = self.get_object()
+        parent_pk = request.data.get("parent")
+        parent = None
+        if parent_pk not in (None, ""):
+            try:
+                parent = self.get_queryset().get(pk=parent_pk)
+            except (ObjectDoesNotExist, ValueError):
+                raise DrfVE({
+                    "parent": f'Invalid pk "{parent_pk}" - object does not exist.'
+                })
+        try:
+            obj.move_to(parent)
+        except DjVE as e:
+            raise DrfVE(e)
+        return Response(self.get_serializer(obj).data)
+
+
+class SearchViewSetMixin():
+    """
+    Adds `search` endpoint returning objects matching all terms of `q`,
+    most relevant first, in pages of `SearchPagination`. List filters of
+    the viewset apply too.
+    """
+    search_pagination_class = custom_pagination.SearchPagination
+
+    @action(detail=False, methods=["get"])
+    def search(self, request, *args, **kwargs):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise DrfVE({"q": "Search query is required."})
+        queryset = self.apply_query_plan(
+            self.filter_queryset(self.get_queryset()), force=True)
+        paginator = self.search_pagination_class()
+        page = paginator.paginate_search(queryset, query, request)
+        return paginator.get_paginated_response(
+            self.get_serializer(page, many=True).data)
@@ -2,3 +2,4 @@ from .workspace import *
 from .category import *
 from .project import *
 from .task import *
+from .job import *
@@ -1,40 +1,304 @@
+from collections import defaultdict
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError as DrfVE
+from rest_framework.utils import model_meta
 from django.db import IntegrityError, transaction
+from django.utils import timezone
 from django.core.exceptions import ValidationError as DjVE
-import copy
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves pks from objects preloaded by `BulkListSerializer` when present
+    in context, instead of one query per value.
+    """
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        objects = self.context.get("related_objects", {}).get(model)
+        if objects is None:
+            return super().to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            pk = model._meta.pk.to_python(data)
+        except (TypeError, DjVE):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in objects:
+            self.fail("does_not_exist", pk_value=data)
+        return objects[pk]
 
 
 class CustomBaseSerializer(serializers.ModelSerializer):
+    serializer_related_field = CachedPrimaryKeyRelatedField
+
+    def build_instance(self, validated_data):
+        """
+        Returns unsaved instance and its many to many values by field name.
+        """
+        serializers.raise_errors_on_nested_writes("create", self, validated_data)
+        model_class = self.Meta.model
+        info = model_meta.get_field_info(model_class)
+        many_to_many = {
+            field_name: validated_data.pop(field_name)
+            for field_name, relation_info in info.relations.items()
+            if relation_info.to_many and field_name in validated_data
+        }
+        return model_class(**validated_data), many_to_many
+
     def create(self, validated_data):
         # user = self.context["request"].user
         # validated_data.update(created_by=user)
-        data_copy = copy.deepcopy(validated_data)
-        with transaction.atomic(savepoint=True, durable=False):
-            try:
-                instance_tmp = super().create(data_copy)
-                instance_tmp.full_clean()
-            except (DjVE, IntegrityError) as e:
-                raise DrfVE(e)
-            finally:
-                transaction.set_rollback(True)
-        return super().create(validated_data)
+        # validate unsaved instance, then insert it and its m2m rows once
+        instance, many_to_many = self.build_instance(validated_data)
+        try:
+            instance.full_clean()
+            with transaction.atomic():
+                instance.save()
+                for field_name, value in many_to_many.items():
+                    getattr(instance, field_name).set(value)
+        except (DjVE, IntegrityError) as e:
+            raise DrfVE(e)
+        return instance
+
+    @staticmethod
+    def get_update_fields(instance, field_names):
+        """
+        Returns fields `update` writes: changed fields of models tracking
+        them, else the validated ones, plus `updated_at` timestamp.
+        """
+        if hasattr(instance, "get_dirty_fields"):
+            update_fields = set(instance.get_dirty_fields())
+        else:
+            update_fields = {
+                instance._meta.get_field(name).attname for name in field_names}
+        if update_fields and any(field.name == "updated_at"
+                                 for field in instance._meta.concrete_fields):
+            update_fields.add("updated_at")
+        return sorted(update_fields)
 
     def update(self, instance, validated_data):
         # user = self.context["request"].user
         # validated_data.update(created_by=user)
-        data_copy = copy.deepcopy(validated_data)
-        with transaction.atomic(savepoint=True, durable=False):
+        # validate changed instance, then write changed columns once
+        serializers.raise_errors_on_nested_writes("update", self, validated_data)
+        info = model_meta.get_field_info(instance)
+        many_to_many = {}
+        for attr, value in validated_data.items():
+            if attr in info.relations and info.relations[attr].to_many:
+                many_to_many[attr] = value
+            else:
+                setattr(instance, attr, value)
+        update_fields = self.get_update_fields(
+            instance, set(validated_data) - set(many_to_many))
+        try:
+            instance.full_clean()
+            with transaction.atomic():
+                if update_fields:
+                    instance.save(update_fields=update_fields)
+                for field_name, value in many_to_many.items():
+                    getattr(instance, field_name).set(value)
+        except (DjVE, IntegrityError) as e:
+            raise DrfVE(e)
+        return instance
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Validates a list of items resolving related pks with one query per
+    related model, and inserts them with `bulk_create` in one transaction.
+    Errors are reported per item, aligned with the payload.
+    """
+    batch_size = 500
+
+    def get_related_fields(self):
+        for field_name, field in self.child.fields.items():
+            relation = getattr(field, "child_relation", field)
+            if not field.read_only and isinstance(
+                    relation, CachedPrimaryKeyRelatedField):
+                yield field_name, relation
+
+    def preload_related_objects(self, data):
+        pks = defaultdict(set)
+        querysets = {}
+        for field_name, relation in self.get_related_fields():
+            queryset = relation.get_queryset()
+            model = queryset.model
+            querysets[model] = queryset
+            for item in data:
+                values = item.get(field_name) if isinstance(item, dict) else None
+                for value in values if isinstance(values, list) else [values]:
+                    try:
+                        pks[model].add(model._meta.pk.to_python(value))
+                    except DjVE:
+                        pass
+        related_objects = {
+            model: queryset.in_bulk(pks[model] - {None})
+            for model, queryset in querysets.items()
+        }
+        self.context["related_objects"] = related_objects
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.preload_related_objects(data)
+        try:
+            return super().to_internal_value(data)
+        except DrfVE as e:
+            # errors keyed by item index, as a list aligned with the payload
+            if isinstance(e.detail, dict) and e.detail and all(
+                    isinstance(key, int) for key in e.detail):
+                raise DrfVE([e.detail.get(index, {})
+                             for index in range(len(data))])
+            raise
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        instances, many_to_many = [], []
+        for attrs in validated_data:
+            instance, values = self.child.build_instance(attrs)
+            instances.append(instance)
+            many_to_many.append(values)
+        # relations were resolved by the serializer, skip their queries
+        relation_names = [name for name, _ in self.get_related_fields()]
+        errors = self.clean_instances(
+            model, instances, [relation_names] * len(instances))
+        if any(errors):
+            raise DrfVE(errors)
+        try:
+            with transaction.atomic():
+                if hasattr(model, "before_bulk_create"):
+                    model.before_bulk_create(instances)
+                model.objects.bulk_create(instances, batch_size=self.batch_size)
+                if hasattr(model, "after_bulk_create"):
+                    model.after_bulk_create(instances)
+                self.bulk_set_many_to_many(model, instances, many_to_many)
+        except IntegrityError as e:
+            # bulk insert was rolled back
+            for instance in instances:
+                instance.pk = None
+                instance._state.adding = True
+            raise DrfVE(self.get_constraint_errors(instances) or e)
+        return instances
+
+    def bulk_update(self, instances, data):
+        """
+        Validates partial updates, `data` aligned with `instances`, and
+        writes them with one update per distinct set of changed values.
+        Changes with side effects on save fall back to `save`.
+        """
+        self.preload_related_objects(data)
+        model = self.child.Meta.model
+        relation_names = {name for name, _ in self.get_related_fields()}
+        changes, errors, excludes = [], [], []
+        for instance, fields in zip(instances, data):
+            child = type(self.child)(instance, data=fields, partial=True,
+                                     context=self.context)
+            if not child.is_valid():
+                changes.append(None)
+                errors.append(child.errors)
+                continue
+            many_to_many = {}
+            for attr, value in child.validated_data.items():
+                if model._meta.get_field(attr).many_to_many:
+                    many_to_many[attr] = value
+                else:
+                    setattr(instance, attr, value)
+            update_fields = self.child.get_update_fields(
+                instance, set(child.validated_data) - set(many_to_many))
+            changes.append((update_fields, many_to_many))
+            errors.append({})
+            # only model `clean` and changed plain fields need validation
+            excludes.append([
+                field.name for field in model._meta.concrete_fields
+                if field.attname not in update_fields
+                or field.name in relation_names
+            ])
+        if any(errors):
+            raise DrfVE(errors)
+        errors = self.clean_instances(model, instances, excludes)
+        if any(errors):
+            raise DrfVE(errors)
+        try:
+            with transaction.atomic():
+                self.bulk_write_updates(model, instances, changes)
+        except IntegrityError as e:
+            raise DrfVE(self.get_constraint_errors(instances) or e)
+        return instances
+
+    @staticmethod
+    def clean_instances(model, instances, excludes):
+        """
+        Returns per item model validation errors. Related rows checked by
+        `clean` are fetched with one query for all items.
+        """
+        if hasattr(model, "prefetch_related_rows"):
+            model.prefetch_related_rows(instances)
+        errors = []
+        for instance, exclude in zip(instances, excludes):
+            try:
+                instance.full_clean(exclude=exclude,
+                                    validate_constraints=False)
+            except DjVE as e:
+                errors.append(serializers.as_serializer_error(e))
+            else:
+                errors.append({})
+        return errors
+
+    def bulk_write_updates(self, model, instances, changes):
+        groups = defaultdict(list)
+        for instance, (update_fields, many_to_many) in zip(instances, changes):
+            side_effect_fields = getattr(
+                instance, "get_save_side_effect_fields", set)()
+            if not update_fields:
+                pass
+            elif side_effect_fields.isdisjoint(update_fields):
+                values = tuple(
+                    (name, getattr(instance, name)) for name in update_fields
+                    if name != "updated_at")
+                groups[values].append(instance)
+            else:
+                instance.save(update_fields=update_fields)
+            for field_name, value in many_to_many.items():
+                getattr(instance, field_name).set(value)
+        has_updated_at = any(field.name == "updated_at"
+                             for field in model._meta.concrete_fields)
+        now = timezone.now()
+        for values, group in groups.items():
+            values = dict(values)
+            if has_updated_at:
+                values["updated_at"] = now
+            model.objects.filter(
+                pk__in=[instance.pk for instance in group]).update(**values)
+        if hasattr(model, "bump_tree_versions"):
+            model.bump_tree_versions([
+                instance.tree_path for group in groups.values()
+                for instance in group])
+
+    def bulk_set_many_to_many(self, model, instances, many_to_many):
+        field_names = {name for values in many_to_many for name in values}
+        for field_name in field_names:
+            field = model._meta.get_field(field_name)
+            through = field.remote_field.through
+            source = through._meta.get_field(field.m2m_field_name()).attname
+            target = through._meta.get_field(
+                field.m2m_reverse_field_name()).attname
+            through.objects.bulk_create([
+                through(**{source: instance.pk, target: related_pk})
+                for instance, values in zip(instances, many_to_many)
+                for related_pk in {obj.pk for obj in values.get(field_name, [])}
+            ], batch_size=self.batch_size)
+
+    @staticmethod
+    def get_constraint_errors(instances):
+        """
+        Returns per item constraint errors against stored rows, or None if
+        items only conflict with each other.
+        """
+        errors = []
+        for instance in instances:
             try:
-                instance = super().update(instance, data_copy)
-                instance.full_clean()
-            except (DjVE, IntegrityError) as e:
-                transaction.set_rollback(True)
-                raise DrfVE(e)
-            except Exception as e:
-                transaction.set_rollback(True)
-                raise DrfVE(f'Unknown error: {e}')
+                instance.validate_constraints()
+            except DjVE as e:
+                errors.append(serializers.as_serializer_error(e))
             else:
-                if self.is_valid(raise_exception=True):
-                    instance.save()
-                    return instance
+                errors.append({})
+        return errors if any(errors) else None
@@ -0,0 +1,13 @@
+from core import models as core_models
+from . import custom_classes
+
+
+class CascadeJobSerializer(custom_classes.CustomBaseSerializer):
+    class Meta:
+        model = core_models.CascadeJob
+        fields = [
+            "id", "workspace", "model_label", "object_pk", "operations",
+            "status", "subtree_size", "processed", "error",
+            "created_at", "updated_at", "finished_at",
+        ]
+        read_only_fields = fields
@@ -1,11 +1,9 @@
-from rest_framework import serializers
-
 from core import models as core_models
 from . import custom_classes
 
 
 class ProjectSerializer(custom_classes.CustomBaseSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = custom_classes.CachedPrimaryKeyRelatedField(
         many=True, read_only=False, queryset=core_models.Tag.objects.all()
     )
 
@@ -164,7 +164,10 @@ class ProjectApiAuthAndCrudTests(ProjectApiFullSetupTestClass):
             user_id_seq=[self.cat_1_project_1.category.workspace.created_by])
 
         assert response.status_code == status.HTTP_200_OK
-        assert response.data == cat_1_serializers.data
+        # paginated, most recently updated first
+        assert response.data["next"] is None
+        assert sorted(response.data["results"], key=lambda item: item["id"]) \
+            == cat_1_serializers.data
         assert response_1.data == project_1_serializer.data[0]
 
     def test_project_create_post(self):
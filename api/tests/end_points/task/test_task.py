@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.exceptions import status
 from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework.request import Request
@@ -201,10 +203,135 @@ class TaskApiAuthAndCrudTests(TaskApiFullSetupTestClass):
             user_id_seq=[self.cat_1_task_1.category.workspace.created_by])
 
         assert response.status_code == status.HTTP_200_OK
+        results = sorted(response.data["results"], key=lambda item: item["id"])
         for i in range(len(cat_1_serializers.data)):
-            assert response.data[i]["title"] == cat_1_serializers.data[i]["title"]
+            assert results[i]["title"] == cat_1_serializers.data[i]["title"]
         assert response_1.data == task_1_serializer.data[0]
 
+    def test_task_get_cursor_pages(self):
+        """
+        Test task list pages follow `next` cursor without overlap.
+        """
+
+        user_id = self.cat_1_task_1.category.workspace.created_by
+        url = reverse(self.view_name_list, kwargs={"user_id": user_id})
+        expected = list(core_models.Task.objects.filter(
+            workspace__created_by=user_id).order_by(
+                "-updated_at", "-id").values_list("id", flat=True))
+        ids, next_url = [], f'{url}?page_size=2'
+        while next_url:
+            # page and its tags, whatever the page size
+            with self.assertNumQueries(2) as queries:
+                response = self.client.get(next_url)
+            # filtered on denormalized owner, without workspace join
+            assert "core_workspace" not in queries.captured_queries[0]["sql"]
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data["results"]) <= 2
+            ids += [item["id"] for item in response.data["results"]]
+            next_url = response.data["next"]
+        assert ids == expected
+
+        response = self.client.get(url, {"cursor": "invalid"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_task_get_filtered(self):
+        """
+        Test task list filters on status, tags, visibility and due date.
+        """
+
+        workspace = self.cat_1_task_1.workspace
+        url = reverse(self.view_name_list,
+                      kwargs={"user_id": workspace.created_by})
+        status_1 = core_models.Status.objects.create(
+            name="status tmp", workspace=workspace)
+        tag_1 = core_models.Tag.objects.create(
+            name="tag tmp", workspace=workspace)
+        task_1 = core_models.Task.objects.get(pk=self.cat_1_task_1.pk)
+        task_1.status = status_1
+        task_1.estimated_end_date = "2025-01-15T00:00:00Z"
+        task_1.save()
+        task_1.tags.set([tag_1])
+        task_2 = core_models.Task.objects.get(pk=self.cat_1_task_2.pk)
+        task_2.estimated_end_date = "2025-01-31T18:30:00Z"
+        task_2.save()
+        task_2.tags.set([tag_1])
+
+        def get_ids(params):
+            response = self.client.get(url, params)
+            assert response.status_code == status.HTTP_200_OK
+            return sorted(item["id"] for item in response.data["results"])
+
+        assert get_ids({"status": status_1.pk}) == [task_1.pk]
+        assert get_ids({"tags__in": f'{tag_1.pk},0'}) == sorted(
+            [task_1.pk, task_2.pk])
+        assert get_ids({
+            "tags": tag_1.pk,
+            "estimated_end_date__lte": "2025-01-30",
+        }) == [task_1.pk]
+        # date only upper bound includes the whole day
+        assert get_ids({
+            "tags": tag_1.pk,
+            "estimated_end_date__lte": "2025-01-31",
+        }) == sorted([task_1.pk, task_2.pk])
+        assert get_ids({
+            "tags": tag_1.pk,
+            "estimated_end_date__lte": "2025-01-31T12:00:00Z",
+        }) == [task_1.pk]
+        assert get_ids({"is_visible": "false"}) == sorted(
+            core_models.Task.objects.filter(
+                owner=workspace.created_by, is_visible=False,
+            ).values_list("pk", flat=True))
+
+        response = self.client.get(url, {"estimated_end_date__gte": "soon"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "estimated_end_date__gte" in response.data
+
+    def test_task_search_get(self):
+        """
+        Test task search is ranked, paginated, scoped to user's workspaces
+        and kept in sync on save and delete.
+        """
+
+        workspace = self.cat_1_task_1.workspace
+        url = reverse("api:user-task-search",
+                      kwargs={"user_id": workspace.created_by})
+        task_1 = core_models.Task.objects.get(pk=self.cat_1_task_1.pk)
+        task_1.detail = "Renew the zebra crossing paint, zebra stripes fade."
+        task_1.save()
+        task_2 = core_models.Task.objects.get(pk=self.cat_1_task_2.pk)
+        task_2.detail = "Call the zebra crossing contractor."
+        task_2.save()
+        user_2 = self.create_user("user-2", "testpassword234")
+        workspace_2 = core_models.Workspace.objects.create(
+            name="ws tmp", created_by=user_2.id)
+        core_models.Task.objects.create(
+            title="zebra crossing", workspace=workspace_2,
+            category=core_models.Category.objects.create(
+                name="category tmp", workspace=workspace_2))
+
+        def get_ids(params):
+            response = self.client.get(url, params)
+            assert response.status_code == status.HTTP_200_OK
+            return [item["id"] for item in response.data["results"]]
+
+        # more frequent term ranks first, other users' tasks are excluded
+        assert get_ids({"q": "zebra crossing"}) == [task_1.pk, task_2.pk]
+        response = self.client.get(url, {"q": "zebra", "page_size": 1})
+        assert [item["id"] for item in response.data["results"]] == [task_1.pk]
+        response = self.client.get(response.data["next"])
+        assert [item["id"] for item in response.data["results"]] == [task_2.pk]
+        assert response.data["next"] is None
+
+        task_1.detail = "Repaint the crossing."
+        task_1.save()
+        assert get_ids({"q": "zebra"}) == [task_2.pk]
+        task_2.delete()
+        assert get_ids({"q": "zebra"}) == []
+        assert get_ids({"q": 'crossing" OR'}) == []
+
+        response = self.client.get(url, {"q": " "})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_task_create_post(self):
         """
         Test task create post.
@@ -225,6 +352,39 @@ class TaskApiAuthAndCrudTests(TaskApiFullSetupTestClass):
         assert response.status_code == status.HTTP_201_CREATED
         assert retrieved_data.exists()
 
+    def test_task_create_post_single_insert(self):
+        """
+        Test task create post validates before inserting the row only once.
+        """
+        tag = core_models.Tag.objects.create(
+            name="tag tmp", workspace=self.ws_1_cat_1.workspace)
+        data = {
+            "title": "task tmp",
+            "workspace": self.ws_1_cat_1.workspace.pk,
+            "category": self.ws_1_cat_1.pk,
+            "tags": [tag.pk],
+        }
+        url = reverse(self.view_name_list,
+                      kwargs={
+                          "user_id": self.cat_1_task_1.category.workspace.created_by,
+                      })
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, data)
+        assert response.status_code == status.HTTP_201_CREATED
+        inserts = [query["sql"] for query in ctx.captured_queries
+                   if query["sql"].startswith("INSERT")]
+        assert len(inserts) == 2
+        assert list(core_models.Task.objects.get(
+            pk=response.data["id"]).tags.all()) == [tag]
+
+        data["title"] = "task invalid"
+        data["parent"] = response.data["id"]
+        data["is_visible"] = not response.data["is_visible"]
+        response = self.client.post(url, data)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not core_models.Task.objects.filter(
+            title="task invalid").exists()
+
     def test_task_update_patch(self):
         """Test task update using patch."""
         data = {
@@ -242,6 +402,25 @@ class TaskApiAuthAndCrudTests(TaskApiFullSetupTestClass):
         assert response.status_code == status.HTTP_200_OK
         assert response.data == task_1_serializer.data[0]
 
+    def test_task_update_patch_single_update(self):
+        """
+        Test task update using patch writes only changed columns once.
+        """
+        url = reverse(self.view_name_detail,
+                      kwargs={
+                          "user_id": self.cat_1_task_1.category.workspace.created_by,
+                          "pk": self.cat_1_task_1.pk,
+                      })
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(url, {"title": "edit 1"})
+        assert response.status_code == status.HTTP_200_OK
+        [update] = [query["sql"] for query in ctx.captured_queries
+                    if query["sql"].startswith("UPDATE")]
+        assert '"title"' in update and '"updated_at"' in update
+        assert '"detail"' not in update
+        self.cat_1_task_1.refresh_from_db()
+        assert self.cat_1_task_1.title == "edit 1"
+
     def test_task_update_put(self):
         """Test task update using put."""
         data = {
@@ -312,7 +491,7 @@ class TaskApiTreeTests(TaskApiFullSetupTestClass):
                     title="Nested task 1_1",
                     workspace=category.workspace,
                     category=category,
-                    parent=cls.cat_1_nested_task_1,
+                    parent=getattr(cls, f'cat_{category.pk}_nested_task_1'),
                 ))
         setattr(cls,
                 f'cat_{category.pk}_nested_task_1_1_1',
@@ -320,7 +499,7 @@ class TaskApiTreeTests(TaskApiFullSetupTestClass):
                     title="Nested task 1_1_1",
                     workspace=category.workspace,
                     category=category,
-                    parent=cls.cat_1_nested_task_1_1,
+                    parent=getattr(cls, f'cat_{category.pk}_nested_task_1_1'),
                 ))
         setattr(cls,
                 f'cat_{category.pk}_nested_task_1_1_2',
@@ -328,7 +507,7 @@ class TaskApiTreeTests(TaskApiFullSetupTestClass):
                     title="Nested task 1_1_2",
                     workspace=category.workspace,
                     category=category,
-                    parent=cls.cat_1_nested_task_1_1,
+                    parent=getattr(cls, f'cat_{category.pk}_nested_task_1_1'),
                 ))
 
     @classmethod
@@ -480,3 +659,217 @@ class TaskApiTreeTests(TaskApiFullSetupTestClass):
                       })
         response = self.client.put(url, data)
         assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_tree_get(self):
+        """
+        Test nested subtree of a task, optionally limited by depth.
+        """
+        url = reverse("api:user-task-tree",
+                      kwargs={
+                          "user_id": self.cat_1_nested_task_1.category.workspace.created_by,
+                          "pk": self.cat_1_nested_task_1.pk,
+                      })
+        # object and descendants, each with their tags
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["id"] == self.cat_1_nested_task_1.pk
+        [child] = response.data["children"]
+        assert child["id"] == self.cat_1_nested_task_1_1.pk
+        assert [item["id"] for item in child["children"]] == [
+            self.cat_1_nested_task_1_1_1.pk,
+            self.cat_1_nested_task_1_1_2.pk,
+        ]
+
+        response = self.client.get(url, {"depth": 1})
+        [child] = response.data["children"]
+        assert child["children"] == []
+
+        response = self.client.get(url, {"depth": "-1"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_move_post(self):
+        """
+        Test moving task subtree to root and back under a parent.
+        """
+        user_id = self.cat_1_nested_task_1_1.category.workspace.created_by
+        url = reverse("api:user-task-move",
+                      kwargs={
+                          "user_id": user_id,
+                          "pk": self.cat_1_nested_task_1_1.pk,
+                      })
+        response = self.client.post(url, {"parent": ""})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["parent"] is None
+
+        response = self.client.post(
+            url, {"parent": self.cat_1_nested_task_1_1_1.pk})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = self.client.post(url, {"parent": self.cat_2_nested_task_1.pk})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "Category should be same as parent's." in response.data[0]
+
+    @override_settings(CASCADE_ASYNC_THRESHOLD=3)
+    def test_update_patch_cascade_job(self):
+        """
+        Test update of a large subtree root responds with queued job.
+        """
+        user_id = self.cat_1_nested_task_1.category.workspace.created_by
+        url = reverse(self.view_name_detail,
+                      kwargs={
+                          "user_id": user_id,
+                          "pk": self.cat_1_nested_task_1.pk,
+                      })
+        response = self.client.patch(url, {"is_visible": False})
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        [job_data] = response.data["cascade_jobs"]
+        assert job_data["status"] == core_models.CascadeJob.Status.PENDING
+
+        response = self.client.get(job_data["url"])
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["object_pk"] == self.cat_1_nested_task_1.pk
+
+        response = self.client.patch(url, {"title": "Renamed"})
+        assert response.status_code == status.HTTP_200_OK
+        assert "cascade_jobs" not in response.data
+
+    def test_bulk_create_post(self):
+        """
+        Test creating a list of tasks with a constant number of queries and
+        per item errors.
+        """
+        parent = self.cat_1_nested_task_1_1
+        parent.refresh_from_db()
+        descendant_count = parent.descendant_count
+        user_id = parent.category.workspace.created_by
+        tag = core_models.Tag.objects.create(
+            name="tag tmp", workspace=parent.workspace)
+        url = reverse("api:user-task-bulk-create",
+                      kwargs={"user_id": user_id})
+
+        def get_items(prefix, count):
+            return [{
+                "title": f'{prefix} {i}',
+                "workspace": parent.workspace.pk,
+                "category": parent.category.pk,
+                "parent": parent.pk,
+                "is_visible": parent.is_visible,
+                "estimated_effort": 2,
+                "tags": [tag.pk],
+            } for i in range(count)]
+
+        with CaptureQueriesContext(connection) as ctx_small:
+            response = self.client.post(
+                url, get_items("small", 2), format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        with CaptureQueriesContext(connection) as ctx_large:
+            response = self.client.post(
+                url, get_items("large", 5), format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(ctx_small.captured_queries) == len(ctx_large.captured_queries)
+        assert [item["tags"] for item in response.data] == [[tag.pk]] * 5
+
+        task = core_models.Task.objects.get(pk=response.data[0]["id"])
+        assert task.tree_path == parent.tree_path + f'{task.pk:010d}/'
+        parent.refresh_from_db()
+        assert parent.descendant_count == descendant_count + 7
+        assert parent.subtree_estimated_effort == 14
+
+        items = get_items("invalid", 3)
+        items[2]["priority"] = 0
+        response = self.client.post(url, items, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data[:2] == [{}, {}]
+        assert "priority" in response.data[2]
+
+        items = get_items("invalid", 2)
+        items[1]["is_visible"] = not parent.is_visible
+        response = self.client.post(url, items, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data[0] == {}
+        assert "Visibility should be same as of parent's." in str(
+            response.data[1])
+        assert not core_models.Task.objects.filter(
+            title__startswith="invalid").exists()
+
+    def test_bulk_update_patch(self):
+        """
+        Test partially updating a list of tasks, grouping equal changes into
+        one update and validating each item.
+        """
+        root = self.cat_1_nested_task_1
+        leaves = [self.cat_1_nested_task_1_1_1, self.cat_1_nested_task_1_1_2]
+        user_id = root.category.workspace.created_by
+        priority = core_models.Priority.objects.create(
+            name="priority tmp", workspace=root.workspace)
+        url = reverse("api:user-task-bulk-update",
+                      kwargs={"user_id": user_id})
+        items = [
+            {"id": task.pk, "fields": {"priority": priority.pk}}
+            for task in leaves
+        ] + [{"id": root.pk, "fields": {"title": "Renamed"}}]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(url, items, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        updates = [query["sql"] for query in ctx.captured_queries
+                   if query["sql"].startswith('UPDATE "core_task"')]
+        assert len(updates) == 2
+        assert {item["id"]: item["priority"] for item in response.data} == {
+            leaves[0].pk: priority.pk, leaves[1].pk: priority.pk,
+            root.pk: root.priority_id,
+        }
+        root.refresh_from_db()
+        assert root.title == "Renamed"
+
+        other_workspace = core_models.Workspace.objects.create(
+            name="workspace tmp", created_by=user_id)
+        other_priority = core_models.Priority.objects.create(
+            name="priority tmp", workspace=other_workspace)
+        response = self.client.patch(url, [
+            {"id": leaves[0].pk, "fields": {"priority": None}},
+            {"id": leaves[1].pk, "fields": {"priority": other_priority.pk}},
+            {"id": 0, "fields": {}},
+        ], format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data[:2] == [{}, {}]
+        assert "id" in response.data[2]
+
+        response = self.client.patch(url, [
+            {"id": leaves[0].pk, "fields": {"priority": None}},
+            {"id": leaves[1].pk, "fields": {"priority": other_priority.pk}},
+        ], format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data[0] == {}
+        assert "same workspace" in str(response.data[1])
+        assert core_models.Task.objects.get(
+            pk=leaves[0].pk).priority_id == priority.pk
+
+    def test_bulk_delete_post(self):
+        """
+        Test deleting tasks matching filter criteria.
+        """
+        root = self.cat_1_nested_task_1
+        user_id = root.category.workspace.created_by
+        status_done = core_models.Status.objects.create(
+            name="done", workspace=root.workspace)
+        done_pks = [self.cat_1_nested_task_1_1_1.pk,
+                    self.cat_1_nested_task_1_1_2.pk]
+        core_models.Task.objects.filter(pk__in=done_pks).update(
+            status=status_done)
+        url = reverse("api:user-task-bulk-delete",
+                      kwargs={"user_id": user_id})
+
+        response = self.client.post(url, {}, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = self.client.post(
+            url, {"workspace__created_by": user_id}, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = self.client.post(url, {
+            "workspace": root.workspace.pk, "status__in": [status_done.pk],
+        }, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["deleted"] == 2
+        assert not core_models.Task.objects.filter(pk__in=done_pks).exists()
+        assert core_models.Task.objects.filter(pk=root.pk).exists()
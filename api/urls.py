@@ -24,6 +24,8 @@ router.register('user/<str:user_id>/project', views.ProjectViewSet,
                 basename='user-project')
 router.register('user/<str:user_id>/task', views.TaskViewSet,
                 basename='user-task')
+router.register('user/<str:user_id>/cascade-job', views.CascadeJobViewSet,
+                basename='user-cascade-job')
 
 
 urlpatterns = [
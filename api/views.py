@@ -1,11 +1,17 @@
+from django.db.models import Prefetch
 from rest_framework import permissions
 
+from core import models as core_models
+
 from api.serializers import workspace as workspace_serializers
 from api.serializers import category as category_serializers
 from api.serializers import project as project_serializers
 from api.serializers import task as task_serializers
+from api.serializers import job as job_serializers
 from . import permissions as api_permissions
 from api.custom import views as custom_views
+from api.custom import pagination as custom_pagination
+from api.custom import filters as custom_filters
 
 
 class WorkspaceViewSet(custom_views.CustomBaseModelViewSet):
@@ -16,7 +22,8 @@ class WorkspaceViewSet(custom_views.CustomBaseModelViewSet):
     ]
 
 
-class CategoryViewSet(custom_views.CustomBaseModelViewSetUser):
+class CategoryViewSet(custom_views.TreeModelViewSetMixin,
+                      custom_views.CustomBaseModelViewSetUser):
     serializer_class = category_serializers.CategorySerializer
     permission_classes = [
         permissions.IsAuthenticated,
@@ -24,20 +31,51 @@ class CategoryViewSet(custom_views.CustomBaseModelViewSetUser):
     ]
 
 
-class ProjectViewSet(custom_views.CustomBaseModelViewSetUser):
+class ProjectViewSet(custom_views.SearchViewSetMixin,
+                     custom_views.TreeModelViewSetMixin,
+                     custom_views.CustomBaseModelViewSetUser):
     serializer_class = project_serializers.ProjectSerializer
     permission_classes = [
         permissions.IsAuthenticated,
         api_permissions.IsAdmin,
     ]
+    pagination_class = custom_pagination.KeysetCursorPagination
+    plan_prefetch_related = [
+        Prefetch("tags", queryset=core_models.Tag.objects.only("id")),
+    ]
+    filter_backends = [custom_filters.FieldFilterBackend]
+    filter_fields = {
+        "status": ["exact", "in", "isnull"],
+        "priority": ["exact", "in", "isnull"],
+        "tags": ["exact", "in"],
+        "category": ["exact", "in"],
+        "is_visible": ["exact"],
+        "estimated_end_date": ["gte", "lte", "isnull"],
+    }
 
 
-class TaskViewSet(custom_views.CustomBaseModelViewSetUser):
+class TaskViewSet(custom_views.SearchViewSetMixin,
+                  custom_views.TreeModelViewSetMixin,
+                  custom_views.CustomBaseModelViewSetUser):
     serializer_class = task_serializers.TaskSerializer
     permission_classes = [
         permissions.IsAuthenticated,
         api_permissions.IsAdmin,
     ]
+    pagination_class = custom_pagination.KeysetCursorPagination
+    plan_prefetch_related = [
+        Prefetch("tags", queryset=core_models.Tag.objects.only("id")),
+    ]
+    filter_backends = [custom_filters.FieldFilterBackend]
+    filter_fields = {
+        "status": ["exact", "in", "isnull"],
+        "priority": ["exact", "in", "isnull"],
+        "tags": ["exact", "in"],
+        "category": ["exact", "in"],
+        "project": ["exact", "in", "isnull"],
+        "is_visible": ["exact"],
+        "estimated_end_date": ["gte", "lte", "isnull"],
+    }
 
 
 class TagViewSet(custom_views.CustomBaseModelViewSetUser):
@@ -62,3 +100,13 @@ class StatusViewSet(custom_views.CustomBaseModelViewSetUser):
         permissions.IsAuthenticated,
         api_permissions.IsAdmin,
     ]
+
+
+class CascadeJobViewSet(custom_views.CustomBaseModelViewSetUser):
+    serializer_class = job_serializers.CascadeJobSerializer
+    permission_classes = [
+        permissions.IsAuthenticated,
+        api_permissions.IsAdmin,
+    ]
+    http_method_names = ["get", "head", "options"]
+    owner_lookup = "workspace__created_by"
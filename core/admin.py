@@ -1,18 +1,21 @@
 from django.contrib import admin
 
 from core import models
+from core.models.custom.delete import delete_in_chunks
 
 
+# for tree models and models whose deletes cascade to them, so "delete
+# selected" syncs trees once per chunk, see `delete_in_chunks`
 class CustomAdmin(admin.ModelAdmin):
     def delete_queryset(self, request, queryset):
-        for obj in queryset.all():
-            obj.delete()
+        delete_in_chunks(queryset)
 
 
-admin.site.register(models.Workspace)
-admin.site.register(models.Category)
+admin.site.register(models.Workspace, CustomAdmin)
+admin.site.register(models.Category, CustomAdmin)
 admin.site.register(models.Tag)
 admin.site.register(models.Priority)
-admin.site.register(models.Status)
+admin.site.register(models.Status, CustomAdmin)
 admin.site.register(models.Project, CustomAdmin)
 admin.site.register(models.Task, CustomAdmin)
+admin.site.register(models.CascadeJob)
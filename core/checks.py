@@ -0,0 +1,16 @@
+from django.core import checks
+
+from core.models.custom.cache import tree_fragment_cache
+
+
+@checks.register(checks.Tags.caches)
+def check_tree_version_cache(app_configs, **kwargs):
+    if tree_fragment_cache.is_enabled():
+        return []
+    return [checks.Warning(
+        "Rendered tree fragments are not cached, TREE_VERSION_CACHE is "
+        "not shared between worker processes.",
+        hint="Set CACHE_URL to a shared cache, e.g. redis or memcached, or "
+             "TREE_FRAGMENT_CACHE_ALLOW_LOCAL for a single process.",
+        id="core.W001",
+    )]
@@ -0,0 +1,42 @@
+import datetime as dt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import models as core_models
+
+
+class Command(BaseCommand):
+    help = "Applies queued tree cascades of large subtrees in bounded chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int,
+            default=getattr(settings, "CASCADE_CHUNK_SIZE", 500),
+            help="Max rows updated per transaction.",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=None,
+            help="Max jobs processed in this run.",
+        )
+        parser.add_argument(
+            "--lease", type=int,
+            default=getattr(settings, "CASCADE_JOB_LEASE", 600),
+            help="Seconds without progress after which a running job, e.g. "
+                 "of a dead worker, is requeued.",
+        )
+
+    def handle(self, *args, **options):
+        reclaimed = core_models.CascadeJob.reclaim_stale(
+            dt.timedelta(seconds=options["lease"]))
+        if reclaimed:
+            self.stdout.write(f'{reclaimed} stale running jobs requeued.')
+        jobs = core_models.CascadeJob.objects.filter(
+            status=core_models.CascadeJob.Status.PENDING,
+        ).order_by("created_at", "pk")
+        if options["limit"] is not None:
+            jobs = jobs[:options["limit"]]
+        for job in jobs:
+            if not job.run(options["chunk_size"]):
+                continue
+            self.stdout.write(
+                f'Job {job.pk} {job.status}: {job.processed} rows updated.')
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:28
+
+from django.db import migrations, models
+
+
+# frozen copy of `core.models.custom.mixins.tree_path_segment`
+def tree_path_segment(pk):
+    return f'{pk:010d}/'
+
+
+def populate_tree_paths(apps, schema_editor):
+    for model_name in ["Category", "Project", "Task"]:
+        model = apps.get_model("core", model_name)
+        parents = dict(model.objects.values_list("pk", "parent_id"))
+        paths = {}
+
+        def get_path(pk):
+            # walk up to a root or a known path, without recursion so deep
+            # trees do not hit the recursion limit
+            chain, visited = [], set()
+            while pk and pk not in paths:
+                if pk in visited:
+                    cycle = chain[chain.index(pk):]
+                    raise ValueError(
+                        f'Cannot populate tree_path of {model_name}, parents '
+                        f'of pks {cycle} form a cycle. Set parent of one of '
+                        f'them to null and migrate again.')
+                chain.append(pk)
+                visited.add(pk)
+                pk = parents[pk]
+            path = paths[pk] if pk else ""
+            for chain_pk in reversed(chain):
+                path = paths[chain_pk] = f'{path}{tree_path_segment(chain_pk)}'
+            return path
+
+        objs = []
+        for pk in parents:
+            objs.append(model(pk=pk, tree_path=get_path(pk)))
+        model.objects.bulk_update(objs, ["tree_path"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='tree_path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=1000),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='tree_path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=1000),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='tree_path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=1000),
+        ),
+        migrations.RunPython(populate_tree_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:31
+
+from django.db import migrations, models
+
+
+# frozen copy of `core.models.custom.mixins.tree_path_pks`
+def tree_path_pks(tree_path):
+    return [int(pk) for pk in tree_path.split("/") if pk]
+
+
+def populate_full_paths(apps, schema_editor):
+    Category = apps.get_model("core", "Category")
+    categories = list(Category.objects.all())
+    names = {category.pk: category.name for category in categories}
+    for category in categories:
+        category.full_path = ' --> '.join(
+            names[pk] for pk in tree_path_pks(category.tree_path)
+            if pk in names
+        )
+    Category.objects.bulk_update(categories, ["full_path"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_tree_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='full_path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=2000),
+        ),
+        migrations.RunPython(populate_full_paths, migrations.RunPython.noop),
+    ]
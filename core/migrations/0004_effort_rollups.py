@@ -0,0 +1,67 @@
+# Generated by Django 5.1.7 on 2026-10-17 06:39
+
+from django.db import migrations, models
+
+
+# frozen copy of `core.models.custom.mixins.tree_path_pks`
+def tree_path_pks(tree_path):
+    return [int(pk) for pk in tree_path.split("/") if pk]
+
+
+def populate_rollups(apps, schema_editor):
+    for model_name in ["Project", "Task"]:
+        model = apps.get_model("core", model_name)
+        objs = {obj.pk: obj for obj in model.objects.all()}
+        for obj in objs.values():
+            for pk in tree_path_pks(obj.tree_path):
+                if pk not in objs:
+                    continue
+                objs[pk].subtree_estimated_effort += obj.estimated_effort or 0
+                objs[pk].subtree_actual_effort += obj.actual_effort or 0
+                if pk != obj.pk:
+                    objs[pk].descendant_count += 1
+        model.objects.bulk_update(objs.values(), [
+            "subtree_estimated_effort", "subtree_actual_effort",
+            "descendant_count",
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_category_full_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='descendant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='subtree_actual_effort',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='subtree_estimated_effort',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='descendant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='subtree_actual_effort',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='subtree_estimated_effort',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.7 on 2026-10-17 07:04
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_owners(apps, schema_editor):
+    Workspace = apps.get_model("core", "Workspace")
+    owner = Subquery(Workspace.objects.filter(
+        pk=OuterRef("workspace_id")).values("created_by")[:1])
+    for model_name in ("Category", "Tag", "Priority", "Status", "Project",
+                       "Task"):
+        apps.get_model("core", model_name).objects.update(owner=owner)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_list_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='project',
+            name='core_project_updated_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='core_task_updated_id_idx',
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='owner',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='priority',
+            name='owner',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='owner',
+            field=models.CharField(blank=True, default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='status',
+            name='owner',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='owner',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='owner',
+            field=models.CharField(blank=True, default='', editable=False, max_length=300),
+        ),
+        migrations.RunPython(populate_owners, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='core_project_owner_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'updated_at', 'id'], name='core_task_owner_updated_idx'),
+        ),
+    ]
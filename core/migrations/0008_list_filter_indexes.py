@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-17 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_workspace_owner'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['owner', 'is_visible', 'status'], name='core_project_owner_visible_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['owner', 'estimated_end_date'], name='core_project_owner_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'is_visible', 'status'], name='core_task_owner_visible_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'estimated_end_date'], name='core_task_owner_due_idx'),
+        ),
+    ]
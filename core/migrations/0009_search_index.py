@@ -0,0 +1,86 @@
+# Generated by Django 5.1.7 on 2026-10-17 07:20
+
+from django.db import migrations
+
+
+# frozen copies of `core.models.custom.search` helpers, later changes to the
+# live index setup must not alter this migration
+SEARCH_FIELDS = ("title", "detail")
+SEARCH_CONFIG = "english"
+
+
+def install_search_index(connection, model):
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+        index = GinIndex(
+            SearchVector(*SEARCH_FIELDS, config=SEARCH_CONFIG),
+            name=f'{table}_search_idx',
+        )
+        with connection.schema_editor() as schema_editor:
+            sql = str(index.create_sql(model, schema_editor))
+            schema_editor.execute(sql.replace(
+                "CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1))
+        return
+    if connection.vendor != "sqlite":
+        return
+    search_table = f'{table}_fts'
+    columns = ", ".join(SEARCH_FIELDS)
+    new_values = ", ".join(f'new.{name}' for name in SEARCH_FIELDS)
+    old_values = ", ".join(f'old.{name}' for name in SEARCH_FIELDS)
+    insert = (f'INSERT INTO {search_table}(rowid, {columns}) '
+              f'VALUES (new.id, {new_values});')
+    delete = (f'INSERT INTO {search_table}({search_table}, rowid, {columns}) '
+              f"VALUES ('delete', old.id, {old_values});")
+    statements = [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {search_table} USING fts5('
+        f"{columns}, content='{table}', content_rowid='id')",
+        f'CREATE TRIGGER IF NOT EXISTS {search_table}_insert '
+        f'AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {search_table}_delete '
+        f'AFTER DELETE ON {table} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {search_table}_update '
+        f'AFTER UPDATE OF {columns} ON {table} BEGIN {delete} {insert} END',
+        f"INSERT INTO {search_table}({search_table}) VALUES ('rebuild')",
+    ]
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def uninstall_search_index(connection, model):
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX IF EXISTS {table}_search_idx')
+    elif connection.vendor == "sqlite":
+        search_table = f'{table}_fts'
+        with connection.cursor() as cursor:
+            for suffix in ("insert", "delete", "update"):
+                cursor.execute(
+                    f'DROP TRIGGER IF EXISTS {search_table}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {search_table}')
+
+
+def create_search_indexes(apps, schema_editor):
+    for model_name in ("Project", "Task"):
+        install_search_index(schema_editor.connection,
+                             apps.get_model("core", model_name))
+
+
+def drop_search_indexes(apps, schema_editor):
+    for model_name in ("Project", "Task"):
+        uninstall_search_index(schema_editor.connection,
+                               apps.get_model("core", model_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -1,3 +1,4 @@
 from .workspace import *
 from .project import *
 from .task import *
+from .job import *
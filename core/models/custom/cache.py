@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+class TreeFragmentCache():
+    """
+    LRU cache of rendered tree fragments, kept in process memory.
+
+    Fragments are keyed by tree root and a per tree version, so bumping the
+    version invalidates every fragment of that tree. Versions are kept in
+    the `TREE_VERSION_CACHE` cache, which must be shared between workers:
+    nothing is cached while it is process local, unless
+    `TREE_FRAGMENT_CACHE_ALLOW_LOCAL` is set for single process setups.
+    """
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_max_size(self):
+        if self.max_size is not None:
+            return self.max_size
+        return getattr(settings, "TREE_FRAGMENT_CACHE_SIZE", 256)
+
+    @staticmethod
+    def get_version_cache():
+        return caches[getattr(settings, "TREE_VERSION_CACHE", "default")]
+
+    def is_enabled(self):
+        """
+        Returns whether versions bumped by a worker are seen by the others.
+        """
+        cache = self.get_version_cache()
+        if isinstance(cache, DummyCache):
+            return False
+        if isinstance(cache, LocMemCache):
+            return getattr(settings, "TREE_FRAGMENT_CACHE_ALLOW_LOCAL", False)
+        return True
+
+    @staticmethod
+    def get_version_key(model, root_pk):
+        return f'tree_version:{model._meta.label_lower}:{root_pk}'
+
+    def get_version(self, model, root_pk):
+        cache = self.get_version_cache()
+        key = self.get_version_key(model, root_pk)
+        version = cache.get(key)
+        if version is None:
+            # unknown or evicted version, never reuse an older one
+            cache.add(key, time.time_ns(), timeout=None)
+            version = cache.get(key)
+        return version
+
+    def bump_versions(self, model, root_pks, using=DEFAULT_DB_ALIAS):
+        """
+        Bumps versions of given trees once the current transaction commits,
+        so fragments rendered from uncommitted rows are never cached under
+        the new version.
+        """
+        root_pks = list(root_pks)
+
+        def bump():
+            version = time.time_ns()
+            self.get_version_cache().set_many({
+                self.get_version_key(model, root_pk): version
+                for root_pk in root_pks
+            }, timeout=None)
+
+        transaction.on_commit(bump, using=using)
+
+    def get_or_render(self, model, root_pk, key, render):
+        """
+        Returns cached fragment for `key` in the tree of `root_pk`, calling
+        `render` on a miss.
+        """
+        if not self.is_enabled():
+            return render()
+        fragment_key = (
+            self.get_version_key(model, root_pk),
+            self.get_version(model, root_pk),
+            *key,
+        )
+        with self._lock:
+            fragment = self._fragments.get(fragment_key)
+            if fragment is not None:
+                self._fragments.move_to_end(fragment_key)
+                return fragment
+        fragment = render()
+        with self._lock:
+            self._fragments[fragment_key] = fragment
+            while len(self._fragments) > self.get_max_size():
+                self._fragments.popitem(last=False)
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+
+tree_fragment_cache = TreeFragmentCache()
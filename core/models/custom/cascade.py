@@ -0,0 +1,133 @@
+import threading
+import weakref
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+def get_async_threshold():
+    return getattr(settings, "CASCADE_ASYNC_THRESHOLD", None)
+
+
+class CascadeBatch():
+    """
+    Cascades queued within one outermost transaction, flushed on its
+    commit. Discarded with the savepoint or transaction which queued it
+    first: django drops its flush callback then, which a finalizer notices
+    as the callback is freed (right away on CPython). Entries of a later
+    inner savepoint which rolls back are still flushed, harmless as
+    operations apply the state read at flush time.
+    """
+    def __init__(self, using):
+        self.using = using
+        self.pending = {}
+        # whether the flush callback is registered and yet to run
+        self.registered = False
+
+    def add(self, obj, operations):
+        operations_by_pk = self.pending.setdefault(type(obj), {})
+        operations_by_pk.setdefault(obj.pk, {}).update(
+            dict.fromkeys(operations))
+
+    def register(self):
+        """
+        Registers flush on commit of the current transaction.
+        """
+        callback = self.flush
+        weakref.finalize(callback, self.discard)
+        transaction.on_commit(callback, using=self.using)
+        self.registered = True
+
+    def discard(self):
+        # flush callback freed without running, i.e. rolled back
+        if self.registered:
+            self.registered = False
+            self.pending.clear()
+
+    def flush(self):
+        self.registered = False
+        items = list(self.pending.items())
+        self.pending.clear()
+        if not items:
+            return
+        with transaction.atomic(using=self.using):
+            for model, operations_by_pk in items:
+                self.flush_model(model, operations_by_pk)
+
+    def flush_model(self, model, operations_by_pk):
+        """
+        Runs queued operations of model's objects, ancestors first. Those
+        covered by an operation already run on an ancestor, see
+        `cascade_covers`, are skipped.
+        """
+        # re-read so the latest values win
+        objs = model.objects.using(self.using).filter(
+            pk__in=operations_by_pk).order_by("tree_path")
+        applied = []
+        for obj in objs:
+            ancestors = [operations for path, operations in applied
+                         if obj.tree_path.startswith(path)]
+            covered = set().union(*ancestors)
+            operations = [operation for operation in operations_by_pk[obj.pk]
+                          if operation not in covered]
+            if not operations:
+                continue
+            if ancestors:
+                # values written by the ancestors' cascades
+                obj.refresh_from_db()
+            for operation in operations:
+                obj.run_cascade(operation)
+            applied.append((obj.tree_path, {
+                covered_operation for operation in operations
+                for covered_operation in model.cascade_covers.get(
+                    operation, ())}))
+
+
+class CascadeCollector():
+    """
+    Collects subtrees needing propagation (visibility, project) during a
+    transaction and applies them once per object on commit of the
+    outermost transaction. Nothing is applied if it rolls back.
+
+    Operations are names understood by the model's `get_cascade_updates`.
+    They read the object's state at flush time, so running them again is
+    harmless. Subtrees of at least `CASCADE_ASYNC_THRESHOLD` rows are
+    queued as `CascadeJob` instead and recorded in `obj.cascade_jobs`.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def get_batch(self, using):
+        """
+        Returns batch of the current transaction, a new one if the previous
+        was flushed or rolled back.
+        """
+        if not hasattr(self._local, "batches"):
+            self._local.batches = {}
+        batch = self._local.batches.get(using)
+        if batch is None or not batch.registered:
+            batch = self._local.batches[using] = CascadeBatch(using)
+            if transaction.get_connection(using).in_atomic_block:
+                batch.register()
+        return batch
+
+    def add(self, obj, *operations):
+        threshold = get_async_threshold()
+        size = obj.get_cascade_size() if threshold is not None else 0
+        if threshold is not None and size >= threshold:
+            job = apps.get_model("core", "CascadeJob").enqueue(
+                obj, operations, size)
+            if not hasattr(obj, "cascade_jobs"):
+                obj.cascade_jobs = []
+            if job not in obj.cascade_jobs:
+                obj.cascade_jobs.append(job)
+            return
+        using = obj._state.db or DEFAULT_DB_ALIAS
+        batch = self.get_batch(using)
+        batch.add(obj, operations)
+        if not transaction.get_connection(using).in_atomic_block:
+            # autocommit, applied right away like `on_commit` callbacks
+            batch.flush()
+
+
+cascade_collector = CascadeCollector()
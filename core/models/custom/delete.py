@@ -0,0 +1,97 @@
+import copy
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import transaction
+
+_local = threading.local()
+
+
+class TreeDeleteBatch():
+    """
+    Tree objects deleted together, synced once per model with
+    `after_tree_bulk_delete`. Without `batch_tree_deletes`, a batch holds
+    the objects of one `Collector`, identified by its `origin`, and is
+    synced once all of them were deleted.
+    """
+    def __init__(self, origin=None, explicit=False):
+        self.origin = origin
+        self.explicit = explicit
+        self.deleted = defaultdict(dict)
+        self.pending = set()
+
+    def add(self, obj):
+        # copied, as deletion sets the instance's pk to None afterwards
+        self.deleted[type(obj)][obj.pk] = copy.copy(obj)
+        self.pending.add((type(obj), obj.pk))
+
+    def sync(self):
+        for model, objs in self.deleted.items():
+            model.after_tree_bulk_delete(list(objs.values()))
+
+
+@contextmanager
+def batch_tree_deletes():
+    """
+    Defers syncing of tree objects deleted within the block, e.g. by
+    several `delete` calls, then syncs them once per model.
+    """
+    batch = getattr(_local, "batch", None)
+    if batch is not None and batch.explicit:
+        yield
+        return
+    _local.batch = batch = TreeDeleteBatch(explicit=True)
+    try:
+        yield
+    finally:
+        _local.batch = None
+    batch.sync()
+
+
+def record_tree_delete(obj, origin):
+    """
+    Records tree `obj` about to be deleted, from `pre_delete`.
+    """
+    batch = getattr(_local, "batch", None)
+    if batch is None or (not batch.explicit and batch.origin is not origin):
+        # another delete's batch is left over only if it failed, when its
+        # rows were not deleted
+        _local.batch = batch = TreeDeleteBatch(origin)
+    batch.add(obj)
+
+
+def finish_tree_delete(obj):
+    """
+    Marks tree `obj` deleted, from `post_delete`. Syncs its batch if it
+    was the last object of its `Collector`.
+    """
+    batch = getattr(_local, "batch", None)
+    if batch is None or batch.explicit:
+        return
+    batch.pending.discard((type(obj), obj.pk))
+    if not batch.pending:
+        _local.batch = None
+        batch.sync()
+
+
+def delete_in_chunks(queryset, chunk_size=None):
+    """
+    Deletes objects of `queryset` in transactions of at most `chunk_size`
+    objects. Per chunk, cascades, `SET_NULL` children and many to many rows
+    are handled by set based statements and trees are synced once.
+    Returns `(count, counts by model label)` like `QuerySet.delete`.
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, "BULK_DELETE_CHUNK_SIZE", 500)
+    model = queryset.model
+    pks_queryset = queryset.order_by("pk").values_list("pk", flat=True)
+    total, counts = 0, Counter()
+    while pks := list(pks_queryset[:chunk_size]):
+        with transaction.atomic(), batch_tree_deletes():
+            count, model_counts = model.objects.filter(pk__in=pks).delete()
+        total += count
+        counts.update(model_counts)
+        if not count:
+            break
+    return total, dict(counts)
@@ -1,131 +1,886 @@
 import datetime as dt
+import uuid
+from collections import defaultdict
 from django.core.exceptions import ValidationError
-from django.urls import reverse
+from django.db import (
+    IntegrityError, connections, models as djm, router, transaction)
+from django.db.models import (
+    DEFERRED, F, Func, OuterRef, Q, Subquery, Value, functions as db_funcs)
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
 
+from core.models.custom.cache import tree_fragment_cache
+
+
+# materialized path: every node stores the zero padded pks of its ancestors
+# and itself, e.g. "0000000001/0000000004/", so a subtree is a prefix match
+TREE_PATH_PK_WIDTH = 10
+TREE_PATH_SEPARATOR = "/"
+TREE_PATH_STEP = TREE_PATH_PK_WIDTH + len(TREE_PATH_SEPARATOR)
+
+
+def tree_path_segment(pk):
+    return f'{pk:0{TREE_PATH_PK_WIDTH}d}{TREE_PATH_SEPARATOR}'
+
+
+def tree_path_pks(tree_path):
+    """
+    Returns list of pks in a tree path, from root to node.
+    """
+    return [int(pk) for pk in tree_path.split(TREE_PATH_SEPARATOR) if pk]
+
+
+# placeholders to resolve url patterns once per render, see `reverse_builder`
+URL_PLACEHOLDER_PK = 918273645
+URL_PLACEHOLDER_UUID = uuid.UUID("91827364-5000-4000-8000-000000000000")
+
+
+def reverse_builder(viewname, kwarg):
+    """
+    Returns a function equivalent to `reverse(viewname, kwargs={kwarg: x})`
+    that resolves the url pattern only once.
+    """
+    url = reverse(viewname, kwargs={kwarg: URL_PLACEHOLDER_PK})
+    prefix, _, suffix = url.partition(str(URL_PLACEHOLDER_PK))
+    return lambda value: f'{prefix}{value}{suffix}'
+
+
+class DirtyFieldsMixin():
+    """
+    Records field values as loaded from the database (or last saved), so
+    changed fields can be told apart on save.
+    """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if value is not DEFERRED
+        }
+        return instance
+
+    def reset_loaded_values(self, fields=None):
+        deferred = self.get_deferred_fields()
+        loaded_values = getattr(self, "_loaded_values", {})
+        for field in self._meta.concrete_fields:
+            if field.attname in deferred:
+                continue
+            if fields is None or field.name in fields or field.attname in fields:
+                loaded_values[field.attname] = getattr(self, field.attname)
+        self._loaded_values = loaded_values
+
+    def get_dirty_fields(self):
+        """
+        Returns set of attnames of fields changed since loaded or saved.
+        All fields are dirty for new objects.
+        """
+        loaded_values = getattr(self, "_loaded_values", None)
+        if self._state.adding or loaded_values is None:
+            return {field.attname for field in self._meta.concrete_fields}
+        return {
+            name for name, value in loaded_values.items()
+            if getattr(self, name) != value
+        }
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.reset_loaded_values(kwargs.get("fields"))
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.reset_loaded_values()
+
+
+class WorkspaceOwnerMixin():
+    """
+    Keeps denormalized `owner` column equal to workspace's `created_by`, so
+    user scoped queries filter on it without joining workspace. Workspace
+    owner changes are propagated by `Workspace.save`.
+    """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._owner_workspace_id = instance.__dict__.get("workspace_id")
+        return instance
+
+    def sync_owner(self):
+        """
+        Sets `owner` if new or moved to another workspace. Returns whether
+        it changed.
+        """
+        if not self._state.adding and \
+                self.workspace_id == getattr(self, "_owner_workspace_id", None):
+            return False
+        owner = self.workspace.created_by
+        changed = owner != self.owner
+        self.owner = owner
+        return changed
+
+    def get_save_side_effect_fields(self):
+        fields = getattr(super(), "get_save_side_effect_fields", set)()
+        return {*fields, "workspace_id"}
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if self.sync_owner() and update_fields is not None:
+            kwargs["update_fields"] = [*update_fields, "owner"]
+        super().save(*args, **kwargs)
+        self._owner_workspace_id = self.workspace_id
+
+    @classmethod
+    def before_bulk_create(cls, objs):
+        """
+        Sets `owner` of objects inserted with `bulk_create`, which skips
+        `save`, with one query for workspaces not cached on them.
+        """
+        field = cls._meta.get_field("workspace")
+        owners = dict(field.related_model.objects.filter(pk__in={
+            obj.workspace_id for obj in objs if not field.is_cached(obj)
+        }).values_list("pk", "created_by"))
+        for obj in objs:
+            if field.is_cached(obj):
+                obj.owner = obj.workspace.created_by
+            else:
+                obj.owner = owners.get(obj.workspace_id, "")
+            obj._owner_workspace_id = obj.workspace_id
+
+
+class RelatedRowsMixin():
+    """
+    Validates invariants against related rows (e.g. same workspace) from
+    `*_id` columns. Related objects already cached on the instance are used
+    as is, other rows are fetched with one union query, for a whole batch
+    with `prefetch_related_rows`.
+    """
+    def get_related_row_fields(self):
+        """
+        Returns dictionary of relation name to attnames of related row
+        columns `clean_related_rows` needs.
+        """
+        return {}
+
+    def clean_related_rows(self, rows):
+        """
+        Hook to validate self against `rows`, dictionary of relation name to
+        related column values (None if relation is empty).
+        """
+
+    @classmethod
+    def fetch_related_rows(cls, objs):
+        """
+        Returns dictionary of `(relation name, pk)` to related column values
+        for relations of objs not cached on them, fetched with one query.
+        """
+        requested = defaultdict(set)
+        columns = {}
+        for obj in objs:
+            for name, attnames in obj.get_related_row_fields().items():
+                field = obj._meta.get_field(name)
+                pk = getattr(obj, field.attname)
+                if pk is not None and not field.is_cached(obj):
+                    requested[name].add(pk)
+                    columns[name] = attnames
+        if not requested:
+            return {}
+        output_fields = {}
+        for name, attnames in columns.items():
+            related_model = cls._meta.get_field(name).related_model
+            for attname in attnames:
+                field = related_model._meta.get_field(attname)
+                output_fields[attname] = djm.BigIntegerField() \
+                    if field.is_relation else type(field)()
+        all_attnames = sorted(output_fields)
+        querysets = []
+        for name, pks in requested.items():
+            # same columns for every relation, padded with nulls
+            values = {
+                f'related_{attname}': F(attname) if attname in columns[name]
+                else Value(None, output_field=output_fields[attname])
+                for attname in all_attnames
+            }
+            querysets.append(
+                cls._meta.get_field(name).related_model.objects.filter(
+                    pk__in=pks,
+                ).order_by().annotate(
+                    related_name=Value(name, output_field=djm.CharField()),
+                    **values,
+                ).values_list("related_name", "pk", *values)
+            )
+        rows = querysets[0].union(*querysets[1:], all=True)
+        return {
+            (name, pk): dict(zip(all_attnames, values))
+            for name, pk, *values in rows
+        }
+
+    @classmethod
+    def prefetch_related_rows(cls, objs):
+        """
+        Fetches related rows needed by `clean` of all objs with one query.
+        """
+        rows = cls.fetch_related_rows(objs)
+        for obj in objs:
+            obj._related_rows = rows
+
+    def get_related_rows(self):
+        prefetched = self.__dict__.pop("_related_rows", {})
+        rows, missing = {}, []
+        for name, attnames in self.get_related_row_fields().items():
+            field = self._meta.get_field(name)
+            pk = getattr(self, field.attname)
+            if pk is None:
+                rows[name] = None
+            elif field.is_cached(self):
+                related = getattr(self, name)
+                rows[name] = {attname: getattr(related, attname)
+                              for attname in attnames}
+            elif (name, pk) in prefetched:
+                rows[name] = prefetched[(name, pk)]
+            else:
+                missing.append(name)
+        if missing:
+            fetched = type(self).fetch_related_rows([self])
+            for name in missing:
+                pk = getattr(self, self._meta.get_field(name).attname)
+                rows[name] = fetched.get((name, pk))
+        return rows
 
-class TreeMixin():
     def clean(self, *args, **kwargs):
-        if self.parent:
-            if self.pk and self.parent.pk == self.pk:
+        self.clean_related_rows(self.get_related_rows())
+        return super().clean(*args, **kwargs)
+
+
+class TreeMixin(RelatedRowsMixin, DirtyFieldsMixin):
+    """
+    Models using this mixin need a self referencing `parent` foreign key
+    (related name `children`) and an indexed `tree_path` char field.
+    """
+    # queued cascade operations of descendants made redundant by each
+    # operation of an ancestor, see `CascadeBatch.flush`
+    cascade_covers = {}
+
+    def clean(self, *args, **kwargs):
+        if self.parent_id:
+            if self.pk and self.parent_id == self.pk:
                 raise ValidationError(
                 message="Parent cannot be object itself.",
                 code="invalid",
             )
-            if hasattr(self, "workspace") and self.workspace != self.parent.workspace:
+            self.validate_no_cycle()
+        return super().clean(*args, **kwargs)
+
+    def get_related_row_fields(self):
+        fields = super().get_related_row_fields()
+        fields["parent"] = [
+            attname for attname in ("workspace_id", "category_id")
+            if hasattr(self, attname)
+        ]
+        return fields
+
+    def clean_related_rows(self, rows):
+        parent = rows.get("parent")
+        if parent:
+            if "workspace_id" in parent and \
+                    self.workspace_id != parent["workspace_id"]:
                 raise ValidationError(
                     "Workspace should be same as parent's.")
-            if hasattr(self, "category") and self.category != self.parent.category:
+            if "category_id" in parent and \
+                    self.category_id != parent["category_id"]:
                 raise ValidationError(
                     "Category should be same as parent's.")
-        return super().clean(*args, **kwargs)
+        super().clean_related_rows(rows)
+
+    def validate_no_cycle(self):
+        """
+        Raises error if parent is a descendant of self. Checked with one
+        indexed query on parent's ancestors, whatever the depth, only when
+        parent changed.
+        """
+        if not self.pk or not self.parent_id:
+            return
+        if "parent_id" not in self.get_dirty_fields():
+            return
+        if type(self).objects.filter(
+            pk=self.parent_id,
+            tree_path__contains=tree_path_segment(self.pk),
+        ).exists():
+            raise ValidationError(
+                message="Parent cannot be object itself or its descendant.",
+                code="invalid",
+            )
+
+    def get_derived_fields(self):
+        """
+        Returns fields maintained with set based updates, which `save` never
+        writes from (possibly stale) in memory values.
+        """
+        return ["tree_path"]
+
+    def get_stored_fields(self):
+        """
+        Returns fields whose stored values are needed to sync derived fields.
+        """
+        return self.get_derived_fields()
+
+    def get_stored_rows(self):
+        """
+        Returns dictionary of stored values of self and parent by pk,
+        fetched with one query.
+        """
+        pks = [pk for pk in (self.pk, self.parent_id) if pk]
+        if not pks:
+            return {}
+        rows = type(self).objects.filter(pk__in=pks).values(
+            "pk", *self.get_stored_fields())
+        return {row["pk"]: row for row in rows}
+
+    def get_update_fields(self, update_fields=None):
+        if update_fields is None:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+            ]
+        derived_fields = self.get_derived_fields()
+        return [name for name in update_fields if name not in derived_fields]
+
+    def get_sync_trigger_fields(self):
+        """
+        Returns attnames of fields whose change requires syncing derived
+        fields on save.
+        """
+        return {"parent_id"}
+
+    def get_save_side_effect_fields(self):
+        """
+        Returns attnames of fields whose change `save` propagates, so they
+        cannot be written with plain updates.
+        """
+        return self.get_sync_trigger_fields()
+
+    def save(self, *args, **kwargs):
+        sync = self._state.adding or not self.get_dirty_fields().isdisjoint(
+            self.get_sync_trigger_fields())
+        if not self._state.adding:
+            kwargs["update_fields"] = self.get_update_fields(
+                kwargs.get("update_fields"))
+        using = kwargs.get("using") or router.db_for_write(
+            type(self), instance=self)
+        # row and derived fields of subtree and ancestors are written together
+        with transaction.atomic(using=using):
+            stored_rows = self.get_stored_rows() if sync else {}
+            super().save(*args, **kwargs)
+            if sync:
+                self.sync_derived_fields(stored_rows)
+            else:
+                self.bump_tree_versions([self.tree_path])
+
+    def sync_derived_fields(self, stored_rows):
+        """
+        Syncs derived fields of self, subtree and ancestors after self was
+        written, given stored rows from before the write.
+        """
+        stored = stored_rows.get(self.pk)
+        old_path = stored["tree_path"] if stored else ""
+        self.update_tree_path(stored_rows)
+        self.bump_tree_versions([old_path, self.tree_path])
 
     @classmethod
-    def get_children(cls, obj):
+    def bump_tree_versions(cls, tree_paths):
         """
-        Returns a dictionary of all children for a given object.
+        Invalidates cached fragments of trees containing given paths.
+        """
+        root_pks = {tree_path_pks(path)[0] for path in tree_paths if path}
+        if root_pks:
+            tree_fragment_cache.bump_versions(
+                cls, root_pks, using=router.db_for_write(cls))
+
+    def get_cascade_updates(self, operation):
+        """
+        Returns `(queryset, values)` pairs written by cascade `operation`.
+        Querysets exclude rows already holding the values, so they can be
+        updated in chunks until empty.
+        """
+        raise ValueError(f'Unknown cascade operation "{operation}".')
+
+    def get_cascade_size(self):
+        """
+        Returns count of rows cascades of self may write, compared against
+        `CASCADE_ASYNC_THRESHOLD`.
+        """
+        return self.descendant_count + 1
+
+    def run_cascade(self, operation, chunk_size=None, on_chunk=None):
+        """
+        Applies cascade `operation` to the subtree, in chunks of `chunk_size`
+        rows with own transaction each if given. `on_chunk` is called with
+        the updated row count of every update. Returns updated row count.
+        """
+        count = 0
+        for queryset, values in self.get_cascade_updates(operation):
+            values = {**values, "updated_at": timezone.now()}
+            if chunk_size is None:
+                updated = queryset.update(**values)
+                count += updated
+                if on_chunk is not None:
+                    on_chunk(updated)
+                continue
+            while pks := list(
+                    queryset.values_list("pk", flat=True)[:chunk_size]):
+                with transaction.atomic():
+                    updated = queryset.model.objects.filter(
+                        pk__in=pks).update(**values)
+                count += updated
+                if on_chunk is not None:
+                    on_chunk(updated)
+                if not updated:
+                    break
+        self.bump_tree_versions([self.tree_path])
+        return count
+
+    @classmethod
+    def after_bulk_create(cls, objs):
+        """
+        Sets derived fields of objects inserted with `bulk_create`, which
+        skips `save`. Parents have to exist before the batch.
+        """
+        parent_paths = dict(cls.objects.filter(
+            pk__in={obj.parent_id for obj in objs if obj.parent_id},
+        ).values_list("pk", "tree_path"))
+        for obj in objs:
+            obj.tree_path = parent_paths.get(obj.parent_id, "") + \
+                tree_path_segment(obj.pk)
+        cls.objects.bulk_update(objs, ["tree_path"])
+        cls.bump_tree_versions([obj.tree_path for obj in objs])
+
+    def update_tree_path(self, stored_rows):
+        """
+        Syncs `tree_path` of self and all descendants with one update.
         """
+        stored = stored_rows.get(self.pk)
+        parent = stored_rows.get(self.parent_id)
+        old_path = stored["tree_path"] if stored else ""
+        parent_path = parent["tree_path"] if parent else ""
+        new_path = f'{parent_path}{tree_path_segment(self.pk)}'
+        self.tree_path = new_path
+        if old_path == new_path:
+            return
+        model = type(self)
+        if old_path:
+            model.objects.filter(tree_path__startswith=old_path).update(
+                tree_path=db_funcs.Concat(
+                    Value(new_path),
+                    db_funcs.Substr("tree_path", len(old_path) + 1),
+                    output_field=djm.CharField(),
+                )
+            )
+        else:
+            model.objects.filter(pk=self.pk).update(tree_path=new_path)
+
+    def get_move_values(self, parent):
+        """
+        Returns field values derived from `parent`, applied to the whole
+        subtree on `move_to`.
+        """
+        return {}
+
+    def after_move(self):
+        """
+        Hook to sync data derived from the moved subtree, e.g. related rows.
+        """
+
+    def move_to(self, parent):
+        """
+        Moves self with its whole subtree under `parent` (or to root when
+        None) with a bounded number of queries, whatever the subtree size.
+        """
+        values = self.get_move_values(parent)
+        self.parent = parent
+        for name, value in values.items():
+            setattr(self, name, value)
+        self.full_clean()
+
+        model = type(self)
+        try:
+            with transaction.atomic():
+                stored_rows = self.get_stored_rows()
+                model.objects.filter(pk=self.pk).update(
+                    parent=parent, updated_at=timezone.now(), **values)
+                self.sync_derived_fields(stored_rows)
+                if values:
+                    # only rows whose values change, `updated_at` included
+                    model.objects.filter(
+                        tree_path__startswith=self.tree_path,
+                    ).exclude(pk=self.pk).exclude(**values).update(
+                        updated_at=timezone.now(), **values)
+                self.after_move()
+        except IntegrityError as e:
+            raise ValidationError(str(e))
+
+    @classmethod
+    def after_tree_bulk_delete(cls, objs):
+        """
+        Syncs derived fields of former subtrees and ancestors after objects
+        were deleted, with a fixed number of queries. Former descendants
+        become roots below their last deleted ancestor. Called once per
+        delete, see `core.models.custom.delete`. Returns former descendants
+        with rebased paths.
+        """
+        deleted_pks = {obj.pk for obj in objs}
+        # topmost deleted nodes, their subtrees hold all former descendants
+        root_paths = set()
+        for path in sorted(obj.tree_path for obj in objs if obj.tree_path):
+            if not any(path[:end] in root_paths
+                       for end in range(TREE_PATH_STEP, len(path), TREE_PATH_STEP)):
+                root_paths.add(path)
+        root_paths = sorted(root_paths)
+        survivors = []
+        # bounded OR lists, SQLite limits expression depth
+        for start in range(0, len(root_paths), 100):
+            condition = Q()
+            for path in root_paths[start:start + 100]:
+                condition |= Q(tree_path__startswith=path)
+            survivors += cls.objects.filter(condition).exclude(
+                pk__in=deleted_pks).only("pk", "parent", "tree_path")
+        old_paths = [obj.tree_path for obj in objs]
+        for obj in survivors:
+            old_paths.append(obj.tree_path)
+            pks = tree_path_pks(obj.tree_path)
+            last_deleted = max(i for i, pk in enumerate(pks) if pk in deleted_pks)
+            obj.tree_path = "".join(
+                tree_path_segment(pk) for pk in pks[last_deleted + 1:])
+        cls.objects.bulk_update(survivors, ["tree_path"], batch_size=500)
+        cls.bump_tree_versions(old_paths)
+        return survivors
+
+    @staticmethod
+    def build_tree(nodes):
+        """
+        Returns a dictionary of tree relationship for a flat list of nodes,
+        built in one pass. Nodes whose parent is not in the list are roots.
+        """
+        nodes = list(nodes)
+        branches = {node.pk: {} for node in nodes}
         result = {}
-        children = obj.children.all()
-        if children.exists:
-            for child in children:
-                if child.children.all().exists():
-                    result[child] = cls.get_children(child)
-                else:
-                    result[child] = {}
+        for node in nodes:
+            branch = branches.get(node.parent_id, result)
+            branch[node] = branches[node.pk]
         return result
 
     @classmethod
-    def get_children_pk_list(cls, obj, result=[]):
+    def get_descendants(cls, objs, depth=None):
+        """
+        Returns queryset of all descendants of given objects, ordered by
+        `tree_path`. Pass `depth` to limit levels below each object.
+        """
+        query = Q()
+        for obj in objs:
+            if not obj.tree_path:
+                continue
+            obj_query = Q(tree_path__startswith=obj.tree_path)
+            if depth is not None:
+                obj_query &= Q(tree_path_length__lte=(
+                    len(obj.tree_path) + depth * TREE_PATH_STEP))
+            query |= obj_query
+        if not query:
+            return cls.objects.none()
+        queryset = cls.objects.all()
+        if depth is not None:
+            queryset = queryset.annotate(
+                tree_path_length=db_funcs.Length("tree_path"))
+        return queryset.filter(query).exclude(
+            pk__in=[obj.pk for obj in objs]).order_by("tree_path")
+
+    @classmethod
+    def get_children(cls, obj):
         """
         Returns a dictionary of all children for a given object.
         """
-        children = obj.children.all()
-        if children.exists():
-            for child in children:
-                result.append(child.pk)
-                if child.children.all().exists():
-                    result.extend(cls.get_children_pk_list(child))
-        return result
+        return cls.build_tree([obj, *cls.get_descendants([obj])])[obj]
+
+    @classmethod
+    def get_descendant_pks(cls, objs):
+        """
+        Returns set of pks of all descendants of given objects (or pks).
+        Follows `parent` with one recursive query, independent of
+        `tree_path`.
+        """
+        root_pks = [getattr(obj, "pk", obj) for obj in objs]
+        if not root_pks:
+            return set()
+        connection = connections[cls.objects.db]
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        pk_column = qn(cls._meta.pk.column)
+        parent_column = qn(cls._meta.get_field("parent").column)
+        placeholders = ", ".join(["%s"] * len(root_pks))
+        sql = (
+            f'WITH RECURSIVE descendants(id) AS ('
+            f' SELECT {pk_column} FROM {table}'
+            f' WHERE {parent_column} IN ({placeholders})'
+            f' UNION'
+            f' SELECT node.{pk_column} FROM {table} node'
+            f' INNER JOIN descendants ON node.{parent_column} = descendants.id'
+            f') SELECT id FROM descendants'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, root_pks)
+            return {row[0] for row in cursor.fetchall()}
+
+    @classmethod
+    def get_children_pk_list(cls, obj):
+        """
+        Returns a list of pks of all children for a given object.
+        """
+        return list(cls.get_descendant_pks([obj]))
 
     @classmethod
     def get_tree(cls, objs):
         """
         Returns a dictionary of tree relationship for given objects.
         """
-        result = {}
-        root_objs = []
-        for obj in objs:
-            if obj.parent not in objs:
-                root_objs.append(obj)
-        for root_obj in root_objs:
-            result[root_obj] = cls.get_children(root_obj)
-        return result
+        objs = list(objs)
+        pks = {obj.pk for obj in objs}
+        root_objs = [obj for obj in objs if obj.parent_id not in pks]
+        return cls.build_tree([*root_objs, *cls.get_descendants(root_objs)])
+
+    @classmethod
+    def get_workspace_tree(cls, workspace, fields=None):
+        """
+        Returns a dictionary of tree relationship for all objects of a
+        workspace, fetched with one query. Pass `fields` to load only
+        those columns.
+        """
+        nodes = cls.objects.filter(workspace=workspace).order_by("tree_path")
+        if fields:
+            nodes = nodes.only("id", "parent", *fields)
+        return cls.build_tree(nodes)
+
+    @classmethod
+    def get_ancestors_map(cls, objs):
+        """
+        Returns a dictionary of pk to list of ancestors (root first) for
+        given objects, fetched with one query.
+        """
+        ancestor_pks = {
+            obj.pk: tree_path_pks(obj.tree_path)[:-1] for obj in objs
+        }
+        all_ancestor_pks = set().union(*ancestor_pks.values())
+        if not all_ancestor_pks:
+            return {pk: [] for pk in ancestor_pks}
+        ancestors = cls.objects.in_bulk(all_ancestor_pks)
+        return {
+            pk: [ancestors[ancestor_pk] for ancestor_pk in pks
+                 if ancestor_pk in ancestors]
+            for pk, pks in ancestor_pks.items()
+        }
 
     @classmethod
     def get_root(cls, obj):
-        if obj.parent:
-            return cls.get_root(obj.parent)
-        else:
+        if not obj.parent_id:
             return obj
+        if not obj.tree_path:
+            # walk parents, guarding against cycles
+            seen = {obj.pk}
+            while obj.parent_id and obj.parent_id not in seen:
+                obj = obj.parent
+                seen.add(obj.pk)
+            return obj
+        return cls.objects.get(pk=tree_path_pks(obj.tree_path)[0])
 
     @classmethod
     def get_hierarchy(cls, obj):
-        root = cls.get_root(obj)
-        return {root: cls.get_tree(root.get_children(root))}
+        """
+        Returns tree of the whole hierarchy containing given object.
+        """
+        root_path = obj.tree_path[:TREE_PATH_STEP]
+        if not root_path:
+            root = cls.get_root(obj)
+            return {root: cls.get_children(root)}
+        return cls.build_tree(cls.objects.filter(
+            tree_path__startswith=root_path).order_by("tree_path"))
 
     @classmethod
-    def _render_hierarchy(cls, tree, attr_name, obj=None):
-        result = '<ul>'
-        for k, v in tree.items():
-            attr_value = getattr(k, attr_name)
-            if hasattr(k, "get_absolute_url"):
-                url = k.get_absolute_url()
-            else:
-                url = ""
-            if obj and k.pk == obj.pk:
-                result += f'''
-                <li>
-                  <a href="{url}"
-                    class="text-warning-emphasis bg-warning-subtle"
-                    >{attr_value}</a>
-                </li>
-                '''
+    def get_url_builder(cls):
+        """
+        Returns a function building absolute url of a node. The url pattern
+        is resolved once from a placeholder object, not once per node.
+        """
+        placeholder = cls(pk=URL_PLACEHOLDER_PK)
+        if hasattr(placeholder, "uuid"):
+            placeholder.uuid = URL_PLACEHOLDER_UUID
+        try:
+            url = placeholder.get_absolute_url()
+        except NoReverseMatch:
+            return lambda node: node.get_absolute_url()
+        for attr_name, value in [("uuid", URL_PLACEHOLDER_UUID),
+                                 ("pk", URL_PLACEHOLDER_PK)]:
+            prefix, found, suffix = url.partition(str(value))
+            if found:
+                return lambda node: f'{prefix}{getattr(node, attr_name)}{suffix}'
+        return lambda node: node.get_absolute_url()
+
+    @classmethod
+    def iter_render_tree(cls, tree, attr_name, obj=None):
+        """
+        Yields html fragments of nested lists for a given tree, e.g. for a
+        `StreamingHttpResponse` or `''.join`. Highlights `obj` if given.
+        """
+        get_url = cls.get_url_builder()
+        yield '<ul>'
+        branches = [iter(tree.items())]
+        while branches:
+            for k, v in branches[-1]:
+                if obj and k.pk == obj.pk:
+                    css_class = "text-warning-emphasis bg-warning-subtle"
+                else:
+                    css_class = "link-secondary"
+                yield (
+                    f'<li><a href="{get_url(k)}" class="{css_class}"'
+                    f'>{getattr(k, attr_name)}</a></li>'
+                )
+                if v:
+                    yield '<ul>'
+                    branches.append(iter(v.items()))
+                    break
             else:
-                result += f'''
-                <li>
-                  <a href="{k.get_absolute_url()}"
-                  class="link-secondary"
-                  >{attr_value}</a>
-                </li>
-                '''
-            if v:
-                result += cls._render_hierarchy(v, attr_name, obj)
-        result += '</ul>'
-        return result
+                branches.pop()
+                yield '</ul>'
+
+    @classmethod
+    def _render_hierarchy(cls, tree, attr_name, obj=None):
+        return ''.join(cls.iter_render_tree(tree, attr_name, obj))
 
     def render_hierarchy(self, attr_name):
-        return self._render_hierarchy(self.get_hierarchy(self), attr_name, self)
+        """
+        Returns rendered hierarchy of self, cached until the tree changes.
+        """
+        def render():
+            return self._render_hierarchy(
+                self.get_hierarchy(self), attr_name, self)
+
+        if not self.tree_path:
+            return render()
+        return tree_fragment_cache.get_or_render(
+            type(self), tree_path_pks(self.tree_path)[0],
+            (attr_name, self.pk), render)
 
     @classmethod
     def render_tree(cls, tree, attr_name):
-        result = '<ul>'
-        for k, v in tree.items():
-            attr_value = getattr(k, attr_name)
-            if hasattr(k, "get_absolute_url"):
-                url = k.get_absolute_url()
-            else:
-                url = ""
-            result += f'''
-            <li>
-              <a href="{url}"
-                class="link-secondary"
-                >{attr_value}</a>
-            </li>
-            '''
-            if v:
-                result += cls.render_tree(v, attr_name)
-        result += '</ul>'
-        return result
+        return ''.join(cls.iter_render_tree(tree, attr_name))
+
+
+class EffortRollupMixin():
+    """
+    Keeps stored subtree totals of `estimated_effort` and `actual_effort`
+    and number of descendants, for `TreeMixin` models. Totals are updated
+    incrementally along the ancestor path on save, move and delete.
+    Use before `TreeMixin` in bases.
+    """
+    rollup_fields = [
+        "subtree_estimated_effort", "subtree_actual_effort",
+        "descendant_count",
+    ]
+
+    def get_derived_fields(self):
+        return [*super().get_derived_fields(), *self.rollup_fields]
+
+    def get_stored_fields(self):
+        return [
+            *super().get_stored_fields(), "estimated_effort", "actual_effort",
+        ]
+
+    def get_sync_trigger_fields(self):
+        return {
+            *super().get_sync_trigger_fields(),
+            "estimated_effort", "actual_effort",
+        }
+
+    def sync_derived_fields(self, stored_rows):
+        stored = stored_rows.get(self.pk)
+        super().sync_derived_fields(stored_rows)
+        own_delta = [self.estimated_effort or 0, self.actual_effort or 0, 0]
+        if stored:
+            old_subtree = [stored[name] for name in self.rollup_fields]
+            old_ancestor_pks = tree_path_pks(stored["tree_path"])[:-1]
+            own_delta[0] -= stored["estimated_effort"] or 0
+            own_delta[1] -= stored["actual_effort"] or 0
+        else:
+            old_subtree, old_ancestor_pks = [0, 0, 0], []
+        new_subtree = [old + delta for old, delta in zip(old_subtree, own_delta)]
+        new_ancestor_pks = tree_path_pks(self.tree_path)[:-1]
+
+        # whole subtree leaves old ancestors and joins new ones
+        deltas = defaultdict(lambda: [0, 0, 0])
+        deltas[self.pk] = own_delta
+        for pk in old_ancestor_pks:
+            deltas[pk][0] -= old_subtree[0]
+            deltas[pk][1] -= old_subtree[1]
+            deltas[pk][2] -= old_subtree[2] + 1
+        for pk in new_ancestor_pks:
+            deltas[pk][0] += new_subtree[0]
+            deltas[pk][1] += new_subtree[1]
+            deltas[pk][2] += new_subtree[2] + 1
+        self.apply_rollup_deltas(deltas)
+        for name, value in zip(self.rollup_fields, new_subtree):
+            setattr(self, name, value)
+
+    @classmethod
+    def after_tree_bulk_delete(cls, objs):
+        survivors = super().after_tree_bulk_delete(objs)
+        deleted_pks = {obj.pk for obj in objs}
+        cls.recompute_rollups({
+            pk for obj in [*objs, *survivors]
+            for pk in tree_path_pks(obj.tree_path)
+        } - deleted_pks)
+        return survivors
+
+    @classmethod
+    def after_bulk_create(cls, objs):
+        super().after_bulk_create(objs)
+        cls.recompute_rollups({
+            pk for obj in objs for pk in tree_path_pks(obj.tree_path)})
+
+    @classmethod
+    def apply_rollup_deltas(cls, deltas):
+        """
+        Adds deltas (dictionary of pk to rollup field deltas) with one
+        update per distinct delta.
+        """
+        pks_by_delta = defaultdict(list)
+        for pk, delta in deltas.items():
+            if any(delta):
+                pks_by_delta[tuple(delta)].append(pk)
+        for delta, pks in pks_by_delta.items():
+            cls.objects.filter(pk__in=pks).update(**{
+                name: F(name) + value
+                for name, value in zip(cls.rollup_fields, delta)
+            })
+
+    @classmethod
+    def recompute_rollups(cls, pks):
+        """
+        Recomputes rollups of given objects from their subtrees, with one
+        update.
+        """
+        if not pks:
+            return
+
+        def subtree_total(expression):
+            return Subquery(
+                cls.objects.filter(
+                    tree_path__startswith=OuterRef("tree_path"),
+                ).order_by().annotate(
+                    total=Func(expression, function="SUM"),
+                ).values("total")[:1]
+            )
+
+        cls.objects.filter(pk__in=pks).update(
+            subtree_estimated_effort=subtree_total(
+                db_funcs.Coalesce("estimated_effort", 0)),
+            subtree_actual_effort=subtree_total(
+                db_funcs.Coalesce("actual_effort", 0)),
+            descendant_count=subtree_total(Value(1)) - 1,
+        )
 
 
 class CommentMixin():
@@ -134,25 +889,29 @@ class CommentMixin():
         return f'{content_display}'
 
     @classmethod
-    def render_comments_tree(cls, tree):
-        if tree:
-            result = '<ul>'
-            for k, v in tree.items():
-                url_update = reverse(
-                    f"demo:task-comment-update", kwargs={"pk": k.pk})
-                url_delete = reverse(
-                    f"demo:task-comment-delete", kwargs={"pk": k.pk})
+    def iter_render_comments_tree(cls, tree):
+        """
+        Yields html fragments of nested lists for a given comments tree.
+        """
+        if not tree:
+            return
+        get_url_update = reverse_builder("demo:task-comment-update", "pk")
+        get_url_delete = reverse_builder("demo:task-comment-delete", "pk")
+        yield '<ul>'
+        branches = [iter(tree.items())]
+        while branches:
+            for k, v in branches[-1]:
                 updated_at_display = dt.datetime.strftime(
                     k.updated_at, '%d-%m-%Y %H-%M %p')
-                result += f'''
+                yield f'''
                 <li>
                     <span>@{k.created_by} (on {updated_at_display}) </span>
                     <span style="display:inline-block; width: .25rem;"></span>
                     <span>
-                      <a href="{url_update}"
+                      <a href="{get_url_update(k.pk)}"
                         class="text-primary-emphasis bg-primary-subtle">Update</a>
                       <span style="display:inline-block; width: .25rem;"></span>
-                      <a href="{url_delete}" 
+                      <a href="{get_url_delete(k.pk)}"
                         class="text-danger-emphasis bg-danger-subtle">Delete</a>
                     </span>
                     <br>
@@ -160,9 +919,13 @@ class CommentMixin():
                 </li>
                 '''
                 if v:
-                    result += cls.render_comments_tree(v)
-            result += '</ul>'
-        else:
-            result = ''
-        return result
+                    yield '<ul>'
+                    branches.append(iter(v.items()))
+                    break
+            else:
+                branches.pop()
+                yield '</ul>'
 
+    @classmethod
+    def render_comments_tree(cls, tree):
+        return ''.join(cls.iter_render_comments_tree(tree))
@@ -0,0 +1,133 @@
+from django.db import connections
+from django.db.models import Q
+
+
+# full text search over these columns of `Project` and `Task`
+SEARCH_FIELDS = ("title", "detail")
+SEARCH_CONFIG = "english"
+
+
+def get_search_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def install_search_index(connection, model, rebuild=False):
+    """
+    Creates search index of model if missing: on SQLite an external
+    content FTS5 table synced by triggers on insert, update and delete, on
+    PostgreSQL a GIN index on the tsvector `search` matches against. Pass
+    `rebuild` to index existing rows.
+
+    SQLite drops triggers when a migration remakes the table, so this also
+    runs after every migrate.
+    """
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+        index = GinIndex(
+            SearchVector(*SEARCH_FIELDS, config=SEARCH_CONFIG),
+            name=f'{table}_search_idx',
+        )
+        with connection.schema_editor() as schema_editor:
+            sql = str(index.create_sql(model, schema_editor))
+            schema_editor.execute(sql.replace(
+                "CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1))
+        return
+    if connection.vendor != "sqlite":
+        return
+    search_table = get_search_table(model)
+    columns = ", ".join(SEARCH_FIELDS)
+    new_values = ", ".join(f'new.{name}' for name in SEARCH_FIELDS)
+    old_values = ", ".join(f'old.{name}' for name in SEARCH_FIELDS)
+    insert = (f'INSERT INTO {search_table}(rowid, {columns}) '
+              f'VALUES (new.id, {new_values});')
+    delete = (f'INSERT INTO {search_table}({search_table}, rowid, {columns}) '
+              f"VALUES ('delete', old.id, {old_values});")
+    statements = [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {search_table} USING fts5('
+        f"{columns}, content='{table}', content_rowid='id')",
+        f'CREATE TRIGGER IF NOT EXISTS {search_table}_insert '
+        f'AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {search_table}_delete '
+        f'AFTER DELETE ON {table} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {search_table}_update '
+        f'AFTER UPDATE OF {columns} ON {table} BEGIN {delete} {insert} END',
+    ]
+    if rebuild:
+        statements.append(
+            f"INSERT INTO {search_table}({search_table}) VALUES ('rebuild')")
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def has_search_table(connection, model):
+    return get_search_table(model) in connection.introspection.table_names()
+
+
+def uninstall_search_index(connection, model):
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX IF EXISTS {table}_search_idx')
+    elif connection.vendor == "sqlite":
+        search_table = get_search_table(model)
+        with connection.cursor() as cursor:
+            for suffix in ("insert", "delete", "update"):
+                cursor.execute(
+                    f'DROP TRIGGER IF EXISTS {search_table}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {search_table}')
+
+
+def get_fts5_query(query):
+    """
+    Returns FTS5 query matching all terms of user input, each quoted so
+    operators and punctuation are matched literally.
+    """
+    terms = query.split()
+    return " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def search(queryset, query, limit, offset=0):
+    """
+    Returns list of objects of queryset matching all terms of `query`,
+    most relevant first, sliced by `offset` and `limit`.
+
+    Other backends than SQLite and PostgreSQL fall back to unranked
+    substring matches, most recently updated first.
+    """
+    if not query.split():
+        return []
+    connection = connections[queryset.db]
+    model = queryset.model
+    if connection.vendor == "sqlite":
+        search_table = get_search_table(model)
+        scope_sql, scope_params = queryset.order_by().values(
+            "pk").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {search_table} '
+                f'WHERE {search_table} MATCH %s AND rowid IN ({scope_sql}) '
+                f'ORDER BY rank, rowid LIMIT %s OFFSET %s',
+                [get_fts5_query(query), *scope_params, limit, offset])
+            pks = [row[0] for row in cursor.fetchall()]
+        objs = {obj.pk: obj for obj in queryset.filter(pk__in=pks)}
+        return [objs[pk] for pk in pks if pk in objs]
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVector)
+        vector = SearchVector(*SEARCH_FIELDS, config=SEARCH_CONFIG)
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        queryset = queryset.alias(search_vector=vector).filter(
+            search_vector=search_query,
+        ).annotate(
+            search_rank=SearchRank(vector, search_query),
+        ).order_by("-search_rank", "pk")
+        return list(queryset[offset:offset + limit])
+    match = Q()
+    for term in query.split():
+        match &= Q(*[Q(**{f'{name}__icontains': term})
+                     for name in SEARCH_FIELDS], _connector=Q.OR)
+    return list(queryset.filter(match).order_by(
+        "-updated_at", "-pk")[offset:offset + limit])
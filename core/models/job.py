@@ -0,0 +1,108 @@
+from django.apps import apps
+from django.db import models as djm
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class CascadeJob(djm.Model):
+    """
+    Tree cascade of a large subtree, queued instead of applied in request
+    and processed in chunks by `run_cascade_jobs` management command.
+
+    A running job bumps `updated_at` after every chunk, its lease. Jobs
+    whose worker died stop bumping it and are requeued by `reclaim_stale`,
+    which is safe as cascade operations skip rows already updated.
+    """
+    class Status(djm.TextChoices):
+        PENDING = "pending", _("pending")
+        RUNNING = "running", _("running")
+        DONE = "done", _("done")
+        FAILED = "failed", _("failed")
+
+    workspace = djm.ForeignKey("core.Workspace", on_delete=djm.CASCADE,
+                               related_name="cascade_jobs")
+    model_label = djm.CharField(max_length=100)
+    object_pk = djm.PositiveBigIntegerField()
+    operations = djm.JSONField(default=list)
+    status = djm.CharField(max_length=20, choices=Status.choices,
+                           default=Status.PENDING, db_index=True)
+    subtree_size = djm.PositiveIntegerField(default=0)
+    processed = djm.PositiveIntegerField(default=0)
+    error = djm.TextField(blank=True)
+    created_at = djm.DateTimeField(auto_now_add=True)
+    updated_at = djm.DateTimeField(auto_now=True)
+    finished_at = djm.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.model_label}:{self.object_pk} | {self.status}'
+
+    @classmethod
+    def enqueue(cls, obj, operations, subtree_size):
+        """
+        Queues `operations` for `obj`, merging into its pending job if any.
+        `subtree_size` is the row count from `get_cascade_size`.
+        """
+        job = cls.objects.filter(
+            model_label=obj._meta.label, object_pk=obj.pk,
+            status=cls.Status.PENDING,
+        ).first()
+        if job is None:
+            return cls.objects.create(
+                workspace_id=obj.workspace_id,
+                model_label=obj._meta.label,
+                object_pk=obj.pk,
+                operations=list(operations),
+                subtree_size=subtree_size,
+            )
+        new_operations = [op for op in operations if op not in job.operations]
+        if new_operations:
+            job.operations += new_operations
+            job.save(update_fields=["operations", "updated_at"])
+        return job
+
+    @classmethod
+    def reclaim_stale(cls, lease):
+        """
+        Requeues running jobs without progress for `lease` (a timedelta).
+        Returns their count.
+        """
+        now = timezone.now()
+        return cls.objects.filter(
+            status=cls.Status.RUNNING, updated_at__lt=now - lease,
+        ).update(status=cls.Status.PENDING, updated_at=now)
+
+    def get_object(self):
+        model = apps.get_model(self.model_label)
+        return model.objects.filter(pk=self.object_pk).first()
+
+    def run(self, chunk_size=None):
+        """
+        Applies queued operations in chunks of `chunk_size` rows. Returns
+        False if the job was already claimed by another worker.
+        """
+        claimed = CascadeJob.objects.filter(
+            pk=self.pk, status=self.Status.PENDING,
+        ).update(status=self.Status.RUNNING, updated_at=timezone.now())
+        if not claimed:
+            return False
+        self.status = self.Status.RUNNING
+
+        def renew_lease(updated):
+            self.processed += updated
+            CascadeJob.objects.filter(pk=self.pk).update(
+                processed=self.processed, updated_at=timezone.now())
+
+        try:
+            # deleted objects have nothing left to propagate
+            obj = self.get_object()
+            if obj is not None:
+                for operation in self.operations:
+                    obj.run_cascade(operation, chunk_size, renew_lease)
+        except Exception as e:
+            self.status = self.Status.FAILED
+            self.error = str(e)
+        else:
+            self.status = self.Status.DONE
+        self.finished_at = timezone.now()
+        self.save()
+        return True
@@ -1,20 +1,26 @@
 import uuid
 import datetime as dt
 from django.core.exceptions import ValidationError
-from django.db import models as djm
+from django.db import models as djm, transaction
 from django.db.models import functions as db_funcs
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from core.models.custom import mixins as core_mixins
+from core.models.custom.cascade import cascade_collector
 
 
-class Project(core_mixins.TreeMixin, djm.Model):
+class Project(core_mixins.WorkspaceOwnerMixin, core_mixins.EffortRollupMixin,
+              core_mixins.TreeMixin, djm.Model):
     uuid = djm.UUIDField(default=uuid.uuid4, editable=False)
     title = djm.CharField(max_length=200)
     detail = djm.TextField(blank=True)
     workspace = djm.ForeignKey("core.Workspace", on_delete=djm.CASCADE,
                                related_name="projects")
+    # workspace's `created_by`, see `WorkspaceOwnerMixin`, indexed in `Meta`
+    owner = djm.CharField(max_length=300, blank=True, default="",
+                          editable=False)
     category = djm.ForeignKey("core.Category", on_delete=djm.CASCADE,
                               related_name="projects")
     tags = djm.ManyToManyField("core.Tag", blank=True,
@@ -25,6 +31,8 @@ class Project(core_mixins.TreeMixin, djm.Model):
                               null=True, blank=True, related_name="projects")
     parent = djm.ForeignKey('self', on_delete=djm.SET_NULL, null=True,
                             blank=True, related_name="children")
+    tree_path = djm.CharField(max_length=1000, blank=True, default="",
+                              editable=False, db_index=True)
     is_visible = djm.BooleanField(default=True)
     estimated_start_date = djm.DateTimeField(null=True, blank=True)
     estimated_end_date = djm.DateTimeField(null=True, blank=True)
@@ -34,9 +42,21 @@ class Project(core_mixins.TreeMixin, djm.Model):
                                                      help_text=_("in days"))
     actual_effort = djm.PositiveSmallIntegerField(null=True, blank=True,
                                                   help_text=_("in days"))
+    # totals of self and all descendants, see `EffortRollupMixin`
+    subtree_estimated_effort = djm.PositiveIntegerField(default=0,
+                                                        editable=False)
+    subtree_actual_effort = djm.PositiveIntegerField(default=0,
+                                                     editable=False)
+    descendant_count = djm.PositiveIntegerField(default=0, editable=False)
     created_at = djm.DateTimeField(auto_now_add=True)
     updated_at = djm.DateTimeField(auto_now=True)
 
+    # changes propagated to the subtree on save, see `get_cascade_updates`
+    cascade_trigger_fields = {"is_visible", "parent_id"}
+    cascade_covers = {
+        "children_visibility": {"task_visibility", "children_visibility"},
+    }
+
     @property
     def due_in(self):
         if self.estimated_end_date:
@@ -53,50 +73,91 @@ class Project(core_mixins.TreeMixin, djm.Model):
     def get_absolute_url(self):
         return reverse("demo:project-detail", kwargs={"uuid": self.uuid})
 
+    def get_cascade_updates(self, operation):
+        values = {"is_visible": self.is_visible}
+        if operation == "task_visibility":
+            return [(self.tasks.exclude(**values), values)]
+        if operation == "children_visibility":
+            # descendant projects and their tasks
+            descendant_pks = self.get_descendants([self]).values("pk")
+            return [
+                (Project.objects.filter(pk__in=descendant_pks).exclude(
+                    **values), values),
+                (self.tasks.model.objects.filter(
+                    project__in=descendant_pks).exclude(**values), values),
+            ]
+        return super().get_cascade_updates(operation)
+
+    def get_cascade_size(self):
+        # descendant projects and tasks of the whole subtree
+        return super().get_cascade_size() + self.tasks.model.objects.filter(
+            project__tree_path__startswith=self.tree_path).count()
+
     def update_task_visibility(self):
-        if self.tasks:
-            for task in self.tasks.all():
-                task.is_visible = self.is_visible
-                task.save()
+        self.run_cascade("task_visibility")
 
     def update_children_visibility(self):
-        # move children to project if root parent is moved
-        children = self.get_children(self)
-        if children:
-            for child in children:
-                child.is_visible = self.is_visible
-                child.save()
-                child.update_children_visibility()
-
-    def clean(self, *args, **kwargs):
-        if self.category and self.category.workspace != self.workspace:
-            raise ValidationError(
-                "Category, status and priority should be from same workspace as self.")
-
-        if self.status and self.status.workspace != self.workspace:
-            raise ValidationError(
-                "Category, status and priority should be from same workspace as self.")
-
-        if self.priority and self.priority.workspace != self.workspace:
-            raise ValidationError(
-                "Category, status and priority should be from same workspace as self.")
-
-        if self.parent:
-            if self.is_visible != self.parent.is_visible:
+        self.run_cascade("children_visibility")
+
+    def get_save_side_effect_fields(self):
+        return {*super().get_save_side_effect_fields(),
+                *self.cascade_trigger_fields}
+
+    def get_move_values(self, parent):
+        if parent is None:
+            return {}
+        return {"is_visible": parent.is_visible}
+
+    def after_move(self):
+        self.tasks.model.objects.filter(
+            project__tree_path__startswith=self.tree_path,
+        ).exclude(is_visible=self.is_visible).update(
+            is_visible=self.is_visible, updated_at=timezone.now())
+
+    def get_related_row_fields(self):
+        fields = super().get_related_row_fields()
+        for name in ("category", "status", "priority"):
+            fields[name] = ["workspace_id"]
+        fields["parent"] = [*fields["parent"], "is_visible"]
+        return fields
+
+    def clean_related_rows(self, rows):
+        for name in ("category", "status", "priority"):
+            if rows[name] and rows[name]["workspace_id"] != self.workspace_id:
+                raise ValidationError(
+                    "Category, status and priority should be from same workspace as self.")
+
+        if rows["parent"]:
+            if self.is_visible != rows["parent"]["is_visible"]:
                 raise ValidationError(
                     "Visibility should be same as of parent's."
                 )
-        return super().clean(*args, **kwargs)
+        super().clean_related_rows(rows)
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        if self.pk:
-            self.update_task_visibility()
-        if self.pk and not self.parent:
-            if self.children.all().exists():
-                self.update_children_visibility()
+        # cascade only if relevant fields changed, e.g. not on title edits
+        cascade = not self._state.adding and not self.get_dirty_fields().isdisjoint(
+            self.cascade_trigger_fields)
+        # same transaction as `TreeMixin.save`, which sets the savepoint
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if cascade:
+                operations = ["task_visibility"]
+                if not self.parent_id:
+                    operations.append("children_visibility")
+                cascade_collector.add(self, *operations)
 
     class Meta:
+        indexes = [
+            # user scoped keyset pagination, see `KeysetCursorPagination`
+            djm.Index(fields=["owner", "updated_at", "id"],
+                      name="core_project_owner_updated_idx"),
+            # list filters, see `FieldFilterBackend`
+            djm.Index(fields=["owner", "is_visible", "status"],
+                      name="core_project_owner_visible_idx"),
+            djm.Index(fields=["owner", "estimated_end_date"],
+                      name="core_project_owner_due_idx"),
+        ]
         constraints = [
             djm.UniqueConstraint(
                 db_funcs.Lower("title"), "workspace", "category",
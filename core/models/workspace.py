@@ -1,13 +1,13 @@
 from django.core.exceptions import ValidationError
-from django.db import models as djm
-from django.db.models import Q, functions as db_funcs
+from django.db import models as djm, transaction
+from django.db.models import Q, Value, functions as db_funcs
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
 from core.models.custom import mixins as core_mixins
 
 
-class Workspace(djm.Model):
+class Workspace(core_mixins.DirtyFieldsMixin, djm.Model):
     name = djm.CharField(_("name"), max_length=200, default="default")
     description = djm.TextField(blank=True)
     is_default = djm.BooleanField(default=False)
@@ -57,9 +57,25 @@ class Workspace(djm.Model):
                 )
         return super().clean(*args, **kwargs)
 
+    def update_owners(self):
+        """
+        Syncs denormalized `owner` of workspace scoped rows.
+        """
+        for relation in self._meta.related_objects:
+            if issubclass(relation.related_model,
+                          core_mixins.WorkspaceOwnerMixin):
+                relation.related_model.objects.filter(**{
+                    relation.field.name: self,
+                }).update(owner=self.created_by)
+
     def save(self, *args, **kwargs):
         self.update_default_workspace()
-        super().save(*args, **kwargs)
+        update_owners = not self._state.adding and \
+            "created_by" in self.get_dirty_fields()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_owners:
+                self.update_owners()
 
     class Meta:
         constraints = [
@@ -70,7 +86,8 @@ class Workspace(djm.Model):
         ]
 
 
-class Category(core_mixins.TreeMixin, djm.Model):
+class Category(core_mixins.WorkspaceOwnerMixin, core_mixins.TreeMixin,
+               djm.Model):
     """
     Workspace categories for segregating projects and tasks.
     """
@@ -78,23 +95,101 @@ class Category(core_mixins.TreeMixin, djm.Model):
     description = djm.CharField(max_length=500, null=True, blank=True)
     workspace = djm.ForeignKey("core.Workspace", on_delete=djm.CASCADE,
                                related_name="categories")
+    # workspace's `created_by`, see `WorkspaceOwnerMixin`
+    owner = djm.CharField(max_length=300, blank=True, default="",
+                          editable=False, db_index=True)
     parent = djm.ForeignKey('self', on_delete=djm.SET_NULL, null=True,
                             blank=True, related_name="children")
+    tree_path = djm.CharField(max_length=1000, blank=True, default="",
+                              editable=False, db_index=True)
+    # denormalized display name including ancestors, e.g. "a --> b --> c"
+    full_path = djm.CharField(max_length=2000, blank=True, default="",
+                              editable=False)
     created_at = djm.DateTimeField(auto_now_add=True)
     updated_at = djm.DateTimeField(auto_now=True)
 
+    FULL_PATH_SEPARATOR = ' --> '
+
     def __str__(self) -> str:
-        category, parent = self, self.parent
-        result = [category.name]
-        while parent:
-            result.append(parent.name)
-            category = parent
-            parent = category.parent
-        return ' --> '.join(list(reversed(result)))
+        if self.full_path:
+            return self.full_path
+        return self.get_full_path()
 
     def get_absolute_url(self):
         return reverse('demo:category-detail', args=[str(self.pk)])
 
+    def get_full_path(self):
+        if self.pk and self.tree_path:
+            ancestors = self.get_ancestors_map([self])[self.pk]
+        else:
+            ancestors, parent = [], self.parent
+            while parent:
+                ancestors.insert(0, parent)
+                parent = parent.parent
+        names = [ancestor.name for ancestor in ancestors] + [self.name]
+        return self.FULL_PATH_SEPARATOR.join(names)
+
+    def update_full_path(self, old_path):
+        """
+        Syncs `full_path` of self and all descendants after rename or
+        reparent, with one update for the descendants.
+        """
+        new_path = self.get_full_path()
+        self.full_path = new_path
+        if old_path == new_path:
+            return
+        Category.objects.filter(pk=self.pk).update(full_path=new_path)
+        if old_path:
+            Category.objects.filter(
+                tree_path__startswith=self.tree_path,
+            ).exclude(pk=self.pk).update(
+                full_path=db_funcs.Concat(
+                    Value(new_path),
+                    db_funcs.Substr("full_path", len(old_path) + 1),
+                    output_field=djm.CharField(),
+                )
+            )
+
+    def get_derived_fields(self):
+        return [*super().get_derived_fields(), "full_path"]
+
+    def get_sync_trigger_fields(self):
+        return {*super().get_sync_trigger_fields(), "name"}
+
+    def sync_derived_fields(self, stored_rows):
+        super().sync_derived_fields(stored_rows)
+        stored = stored_rows.get(self.pk)
+        self.update_full_path(stored["full_path"] if stored else "")
+
+    @classmethod
+    def rebuild_full_paths(cls, categories):
+        """
+        Rebuilds `full_path` of given categories from their ancestors, with
+        one query for the ancestors and one bulk update. Takes a queryset,
+        pks or loaded categories, which are updated in place.
+        """
+        categories = list(categories)
+        if categories and not isinstance(categories[0], Category):
+            categories = list(cls.objects.filter(pk__in=categories))
+        ancestors = cls.get_ancestors_map(categories)
+        for category in categories:
+            names = [ancestor.name for ancestor in ancestors[category.pk]]
+            category.full_path = cls.FULL_PATH_SEPARATOR.join(
+                names + [category.name])
+        cls.objects.bulk_update(categories, ["full_path"])
+        return categories
+
+    @classmethod
+    def after_tree_bulk_delete(cls, objs):
+        survivors = super().after_tree_bulk_delete(objs)
+        cls.rebuild_full_paths([obj.pk for obj in survivors])
+        return survivors
+
+    @classmethod
+    def after_bulk_create(cls, objs):
+        super().after_bulk_create(objs)
+        cls.rebuild_full_paths(objs)
+
     class Meta:
         verbose_name = _("workspace category")
         verbose_name_plural = _("workspace categories")
@@ -106,10 +201,13 @@ class Category(core_mixins.TreeMixin, djm.Model):
         ]
 
 
-class Tag(djm.Model):
+class Tag(core_mixins.WorkspaceOwnerMixin, djm.Model):
     name = djm.CharField(_("name"), max_length=200)
     workspace = djm.ForeignKey(
         "core.Workspace", on_delete=djm.CASCADE, related_name="tags")
+    # workspace's `created_by`, see `WorkspaceOwnerMixin`
+    owner = djm.CharField(max_length=300, blank=True, default="",
+                          editable=False, db_index=True)
     created_at = djm.DateTimeField(auto_now_add=True)
     updated_at = djm.DateTimeField(auto_now=True)
 
@@ -124,12 +222,15 @@ class Tag(djm.Model):
         ]
 
 
-class Priority(djm.Model):
+class Priority(core_mixins.WorkspaceOwnerMixin, djm.Model):
     name = djm.CharField(_("name"), max_length=200)
     description = djm.CharField(max_length=500, null=True, blank=True)
     order = djm.SmallIntegerField(default=0, null=True)
     workspace = djm.ForeignKey("core.Workspace", on_delete=djm.CASCADE,
                                related_name="priorities")
+    # workspace's `created_by`, see `WorkspaceOwnerMixin`
+    owner = djm.CharField(max_length=300, blank=True, default="",
+                          editable=False, db_index=True)
     created_at = djm.DateTimeField(auto_now_add=True)
     updated_at = djm.DateTimeField(auto_now=True)
 
@@ -145,12 +246,15 @@ class Priority(djm.Model):
         ]
 
 
-class Status(djm.Model):
+class Status(core_mixins.WorkspaceOwnerMixin, djm.Model):
     name = djm.CharField(_("name"), max_length=200)
     description = djm.CharField(max_length=500, null=True, blank=True)
     order = djm.SmallIntegerField(default=0, null=True)
     workspace = djm.ForeignKey("core.Workspace", on_delete=djm.CASCADE,
                                related_name="statuses")
+    # workspace's `created_by`, see `WorkspaceOwnerMixin`
+    owner = djm.CharField(max_length=300, blank=True, default="",
+                          editable=False, db_index=True)
     created_at = djm.DateTimeField(auto_now_add=True)
     updated_at = djm.DateTimeField(auto_now=True)
 
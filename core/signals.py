@@ -0,0 +1,35 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, pre_delete
+from django.dispatch import receiver
+
+from core import models as core_models
+from core.models.custom.delete import finish_tree_delete, record_tree_delete
+from core.models.custom import search as core_search
+
+
+@receiver(pre_delete, sender=core_models.Category)
+@receiver(pre_delete, sender=core_models.Project)
+@receiver(pre_delete, sender=core_models.Task)
+def record_tree_on_delete(sender, instance, origin=None, **kwargs):
+    # also runs for queryset and cascade deletes, unlike `Model.delete`
+    record_tree_delete(instance, origin)
+
+
+@receiver(post_delete, sender=core_models.Category)
+@receiver(post_delete, sender=core_models.Project)
+@receiver(post_delete, sender=core_models.Task)
+def rebase_tree_on_delete(sender, instance, **kwargs):
+    # trees are synced once all rows of the delete are gone, so subtrees
+    # are rebased past every deleted ancestor whatever the pk order
+    finish_tree_delete(instance)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    # SQLite drops triggers of tables remade by later migrations
+    connection = connections[using]
+    if sender.name != "core" or connection.vendor != "sqlite":
+        return
+    for model in (core_models.Project, core_models.Task):
+        if core_search.has_search_table(connection, model):
+            core_search.install_search_index(connection, model)
@@ -1,5 +1,6 @@
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.test import override_settings
 from core import models as core_models
 from ..generic_classes import CustomTestCaseSetup
 
@@ -273,3 +274,116 @@ class ProjectModelTreeTests(ProjectModelFullSetupTestClass):
             project.full_clean()
         except ValidationError as e:
             assert self.msg_visibility in str(e)
+
+    def test_visibility_propagation_on_save(self):
+        """
+        Test root project visibility is propagated to descendant projects
+        and their tasks with set based updates.
+        """
+
+        root = self.ws_1_cat_1_nested_project_1
+        for project in [root, self.ws_1_cat_1_nested_project_1_1_2]:
+            self.db_create_tasks(self.user, project.category, project)
+        subtree_pks = [
+            root.pk,
+            self.ws_1_cat_1_nested_project_1_1.pk,
+            self.ws_1_cat_1_nested_project_1_1_1.pk,
+            self.ws_1_cat_1_nested_project_1_1_2.pk,
+        ]
+        root.is_visible = False
+        with self.captureOnCommitCallbacks(execute=True):
+            root.save()
+        assert not self.get_project_query(subtree_pks).filter(
+            is_visible=True).exists()
+        assert not core_models.Task.objects.filter(
+            project__in=subtree_pks, is_visible=True).exists()
+        assert self.get_project_query(
+            [self.ws_1_cat_2_nested_project_1.pk]).get().is_visible
+
+    def test_no_cascade_on_title_update(self):
+        """
+        Test editing only title of a root project does not cascade.
+        """
+
+        root = self.get_project_query([self.ws_1_cat_1_nested_project_1.pk]).get()
+        root.title = "Renamed"
+        assert root.get_dirty_fields() == {"title"}
+        # savepoint, update and release only
+        with self.assertNumQueries(3):
+            root.save()
+        assert root.get_dirty_fields() == set()
+
+    def test_cascade_coalesced_per_transaction(self):
+        """
+        Test cascades queued within a transaction are flushed once on commit.
+        """
+
+        root = self.get_project_query([self.ws_1_cat_1_nested_project_1.pk]).get()
+        child = self.get_project_query(
+            [self.ws_1_cat_1_nested_project_1_1.pk]).get()
+        self.db_create_tasks(self.user, child.category, child)
+        with self.captureOnCommitCallbacks() as callbacks:
+            root.is_visible = False
+            root.save()
+            root.is_visible = True
+            root.save()
+            child.is_visible = False
+            child.save()
+        # descendants are untouched until commit
+        assert core_models.Task.objects.filter(
+            project=child, is_visible=True).exists()
+        # child's task visibility is covered by root's children visibility:
+        # savepoint, rows, root's three updates, release
+        with self.assertNumQueries(6):
+            for callback in callbacks:
+                callback()
+        root.refresh_from_db()
+        assert root.is_visible
+        assert self.get_project_query(
+            [self.ws_1_cat_1_nested_project_1_1.pk]).get().is_visible
+        assert not core_models.Task.objects.filter(
+            project=child, is_visible=False).exists()
+
+    def test_cascade_discarded_on_rollback(self):
+        """
+        Test cascades queued in a rolled back transaction are not flushed
+        with a later one.
+        """
+
+        root = self.get_project_query([self.ws_1_cat_1_nested_project_1.pk]).get()
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                root.is_visible = False
+                root.save()
+                transaction.set_rollback(True)
+            # hidden without queuing, a stale flush would cascade it
+            core_models.Project.objects.filter(pk=root.pk).update(
+                is_visible=False)
+            other = self.get_project_query(
+                [self.ws_1_cat_2_nested_project_1.pk]).get()
+            other.is_visible = False
+            other.save()
+        for callback in callbacks:
+            callback()
+        assert self.get_project_query(
+            [self.ws_1_cat_1_nested_project_1_1.pk]).get().is_visible
+        assert not self.get_project_query(
+            [self.ws_1_cat_2_nested_project_1_1.pk]).get().is_visible
+
+    @override_settings(CASCADE_ASYNC_THRESHOLD=6)
+    def test_cascade_job_counts_subtree_tasks(self):
+        """
+        Test tasks of the subtree count towards the cascade job threshold.
+        """
+
+        root = self.get_project_query([self.ws_1_cat_1_nested_project_1.pk]).get()
+        leaf = self.ws_1_cat_1_nested_project_1_1_2
+        self.db_create_tasks(self.user, leaf.category, leaf)
+        root.is_visible = False
+        with self.captureOnCommitCallbacks(execute=True):
+            root.save()
+        [job] = root.cascade_jobs
+        # four projects and two tasks
+        assert job.subtree_size == 6
+        assert core_models.Task.objects.filter(
+            project=leaf, is_visible=True).count() == 2
@@ -1,6 +1,17 @@
+import datetime as dt
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from core import models as core_models
+from core.models.custom.cache import TreeFragmentCache, tree_fragment_cache
+from core.models.custom.delete import delete_in_chunks
+from core.models.custom.mixins import tree_path_pks
 from ..generic_classes import CustomTestCaseSetup
 
 
@@ -177,7 +188,13 @@ class TaskModelTreeTests(TaskModelFullSetupTestClass):
         cls.db_create_categories_nested(cls.user, cls.ws_1_category_2)
         cls.db_create_categories_nested(cls.user, cls.ws_2_category_2)
 
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        tree_fragment_cache.clear()
+
     msg_parent = "Parent cannot be object itself."
+    msg_parent_descendant = "Parent cannot be object itself or its descendant."
     msg_parent_workspace = "Workspace should be same as parent's."
     msg_parent_category = "Category should be same as parent's."
     msg_visibility = "Visibility should be same as of parent's."
@@ -275,3 +292,439 @@ class TaskModelTreeTests(TaskModelFullSetupTestClass):
             task.full_clean()
         except ValidationError as e:
             assert self.msg_visibility in str(e)
+
+    def test_tree_path_on_create(self):
+        """
+        Test task tree path holds pks of all ancestors and self.
+        """
+
+        task = self.get_task_query(
+            [self.ws_1_cat_1_nested_task_1_1_1.pk]).get()
+        assert tree_path_pks(task.tree_path) == [
+            self.ws_1_cat_1_nested_task_1.pk,
+            self.ws_1_cat_1_nested_task_1_1.pk,
+            self.ws_1_cat_1_nested_task_1_1_1.pk,
+        ]
+
+    def test_tree_path_on_parent_update(self):
+        """
+        Test descendants tree paths are moved along with parent update.
+        """
+
+        self.ws_1_cat_1_nested_task_1_1.parent = None
+        self.ws_1_cat_1_nested_task_1_1.save()
+        task = self.get_task_query(
+            [self.ws_1_cat_1_nested_task_1_1_1.pk]).get()
+        assert tree_path_pks(task.tree_path) == [
+            self.ws_1_cat_1_nested_task_1_1.pk,
+            self.ws_1_cat_1_nested_task_1_1_1.pk,
+        ]
+        assert core_models.Task.get_root(task) == self.ws_1_cat_1_nested_task_1_1
+
+    def test_get_children(self):
+        """
+        Test task children are fetched as nested dictionary with one query.
+        """
+
+        with self.assertNumQueries(1):
+            children = core_models.Task.get_children(
+                self.ws_1_cat_1_nested_task_1)
+        assert children == {
+            self.ws_1_cat_1_nested_task_1_1: {
+                self.ws_1_cat_1_nested_task_1_1_1: {},
+                self.ws_1_cat_1_nested_task_1_1_2: {},
+            },
+        }
+
+    def test_get_hierarchy(self):
+        """
+        Test whole task hierarchy is fetched from any node with one query.
+        """
+
+        with self.assertNumQueries(1):
+            hierarchy = core_models.Task.get_hierarchy(
+                self.ws_1_cat_1_nested_task_1_1_2)
+        assert hierarchy == {
+            self.ws_1_cat_1_nested_task_1: {
+                self.ws_1_cat_1_nested_task_1_1: {
+                    self.ws_1_cat_1_nested_task_1_1_1: {},
+                    self.ws_1_cat_1_nested_task_1_1_2: {},
+                },
+            },
+        }
+
+    def test_get_descendant_pks(self):
+        """
+        Test descendants of many tasks are fetched with one query and
+        results are not accumulated across calls.
+        """
+
+        roots = [self.ws_1_cat_1_nested_task_1_1, self.ws_1_cat_2_nested_task_1]
+        expected = {
+            self.ws_1_cat_1_nested_task_1_1_1.pk,
+            self.ws_1_cat_1_nested_task_1_1_2.pk,
+            self.ws_1_cat_2_nested_task_1_1.pk,
+            self.ws_1_cat_2_nested_task_1_1_1.pk,
+            self.ws_1_cat_2_nested_task_1_1_2.pk,
+        }
+        with self.assertNumQueries(1):
+            pks = core_models.Task.get_descendant_pks(roots)
+        assert pks == expected
+        assert core_models.Task.get_descendant_pks(roots) == expected
+        assert core_models.Task.get_children_pk_list(
+            self.ws_1_cat_1_nested_task_1_1_1) == []
+
+    def test_get_workspace_tree(self):
+        """
+        Test tree of all workspace tasks is built from one query.
+        """
+
+        with self.assertNumQueries(1):
+            tree = core_models.Task.get_workspace_tree(
+                self.workspace_1, fields=["title"])
+        assert len(tree) == self.get_task_query().filter(
+            workspace=self.workspace_1, parent=None).count()
+        assert tree[self.ws_1_cat_1_nested_task_1] == {
+            self.ws_1_cat_1_nested_task_1_1: {
+                self.ws_1_cat_1_nested_task_1_1_1: {},
+                self.ws_1_cat_1_nested_task_1_1_2: {},
+            },
+        }
+        assert self.ws_2_cat_4_nested_task_1 not in tree
+
+    def test_render_hierarchy(self):
+        """
+        Test hierarchy is rendered with one query and url pattern resolved
+        once per render.
+        """
+
+        urls = []
+
+        def get_absolute_url(task):
+            urls.append(task.uuid)
+            return f'/task/{task.uuid}'
+
+        task = self.ws_1_cat_1_nested_task_1_1
+        with mock.patch.object(core_models.Task, "get_absolute_url",
+                               get_absolute_url):
+            with self.assertNumQueries(1):
+                html = task.render_hierarchy("title")
+        assert len(urls) == 1
+        assert html.count("<ul>") == html.count("</ul>") == 3
+        assert html.count("<li>") == 4
+        assert f'href="/task/{self.ws_1_cat_1_nested_task_1_1_2.uuid}"' in html
+        assert (
+            f'href="/task/{task.uuid}" class="text-warning-emphasis'
+        ) in html
+
+    def test_tree_path_on_parent_delete(self):
+        """
+        Test children of deleted task become roots of their subtrees.
+        """
+
+        self.ws_1_cat_1_nested_task_1_1.delete()
+        task = self.get_task_query(
+            [self.ws_1_cat_1_nested_task_1_1_1.pk]).get()
+        assert task.parent is None
+        assert tree_path_pks(task.tree_path) == [task.pk]
+        assert core_models.Task.get_root(task) == task
+
+    @override_settings(TREE_FRAGMENT_CACHE_ALLOW_LOCAL=True)
+    def test_render_hierarchy_cached(self):
+        """
+        Test rendered hierarchy is cached until a node of the tree is
+        saved or deleted and the transaction commits.
+        """
+
+        task = self.ws_1_cat_1_nested_task_1_1
+        with mock.patch.object(core_models.Task, "get_absolute_url",
+                               lambda task: f'/task/{task.uuid}'):
+            html = task.render_hierarchy("title")
+            with self.assertNumQueries(0):
+                assert task.render_hierarchy("title") == html
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ws_1_cat_1_nested_task_1_1_2.title = "Renamed"
+                self.ws_1_cat_1_nested_task_1_1_2.save()
+                # version is bumped on commit only
+                assert task.render_hierarchy("title") == html
+            assert "Renamed" in task.render_hierarchy("title")
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ws_1_cat_1_nested_task_1_1_2.delete()
+            assert "Renamed" not in task.render_hierarchy("title")
+
+    def test_render_hierarchy_not_cached_with_local_versions(self):
+        """
+        Test hierarchy is rendered on every call while tree versions are
+        kept in a process local cache.
+        """
+
+        task = self.ws_1_cat_1_nested_task_1_1
+        with mock.patch.object(core_models.Task, "get_absolute_url",
+                               lambda task: f'/task/{task.uuid}'):
+            task.render_hierarchy("title")
+            with self.assertNumQueries(1):
+                task.render_hierarchy("title")
+
+    @override_settings(TREE_FRAGMENT_CACHE_ALLOW_LOCAL=True)
+    def test_fragment_cache_lru_eviction(self):
+        """
+        Test least recently used fragments are evicted above max size.
+        """
+
+        fragment_cache = TreeFragmentCache(max_size=2)
+        model = core_models.Task
+        fragment_cache.get_or_render(model, 1, ("a",), lambda: "a")
+        fragment_cache.get_or_render(model, 1, ("b",), lambda: "b")
+        fragment_cache.get_or_render(model, 1, ("a",), lambda: "stale")
+        fragment_cache.get_or_render(model, 1, ("c",), lambda: "c")
+        assert fragment_cache.get_or_render(
+            model, 1, ("a",), lambda: "new") == "a"
+        assert fragment_cache.get_or_render(
+            model, 1, ("b",), lambda: "new") == "new"
+
+    def test_move_to(self):
+        """
+        Test moving task updates its subtree's project and visibility with
+        a bounded number of queries.
+        """
+
+        parent = self.cat_1_pr_1_task_1
+        core_models.Task.objects.filter(pk=parent.pk).update(is_visible=False)
+        parent.is_visible = False
+        task = self.get_task_query([self.ws_1_cat_1_nested_task_1_1.pk]).get()
+        leaf = self.get_task_query([self.ws_1_cat_1_nested_task_1_1_1.pk])
+        updated_at = leaf.get().updated_at
+        with self.assertNumQueries(15):
+            task.move_to(parent)
+        moved = self.get_task_query([
+            task.pk,
+            self.ws_1_cat_1_nested_task_1_1_1.pk,
+            self.ws_1_cat_1_nested_task_1_1_2.pk,
+        ])
+        for moved_task in moved:
+            assert moved_task.project == parent.project
+            assert not moved_task.is_visible
+            assert moved_task.tree_path.startswith(parent.tree_path)
+        assert self.get_task_query([task.pk]).get().parent == parent
+        # descendants are touched only when their values change
+        updated_at, previous = leaf.get().updated_at, updated_at
+        assert updated_at > previous
+        task.move_to(parent)
+        assert leaf.get().updated_at == updated_at
+
+    def test_error_move_to_descendant(self):
+        """
+        Test task cannot be moved under its own descendant.
+        """
+
+        task = self.ws_1_cat_1_nested_task_1
+        with self.assertRaisesMessage(ValidationError,
+                                      "Parent cannot be object itself"):
+            task.move_to(self.ws_1_cat_1_nested_task_1_1_1)
+
+    def test_error_parent_descendant_on_update(self):
+        """
+        Test task parent is not its descendant at any depth.
+        """
+
+        task = self.ws_1_cat_1_nested_task_1
+        task.parent = self.ws_1_cat_1_nested_task_1_1_1
+        with self.assertRaisesMessage(ValidationError,
+                                      self.msg_parent_descendant):
+            task.full_clean()
+
+    def test_effort_rollups(self):
+        """
+        Test subtree effort totals and descendant count follow effort
+        updates, moves and deletes.
+        """
+
+        def get_rollups(task):
+            task.refresh_from_db()
+            return (task.subtree_estimated_effort, task.subtree_actual_effort,
+                    task.descendant_count)
+
+        root = self.ws_1_cat_1_nested_task_1
+        for task, estimated, actual in [
+            (self.ws_1_cat_1_nested_task_1_1, 2, 1),
+            (self.ws_1_cat_1_nested_task_1_1_1, 3, 0),
+            (self.ws_1_cat_1_nested_task_1_1_2, 5, 4),
+        ]:
+            task.estimated_effort, task.actual_effort = estimated, actual
+            task.save()
+        assert get_rollups(root) == (10, 5, 3)
+        assert get_rollups(self.ws_1_cat_1_nested_task_1_1) == (10, 5, 2)
+
+        self.ws_1_cat_1_nested_task_1_1_2.move_to(None)
+        assert get_rollups(root) == (5, 1, 2)
+
+        self.ws_1_cat_1_nested_task_1_1_1.delete()
+        assert get_rollups(root) == (2, 1, 1)
+        assert get_rollups(self.ws_1_cat_1_nested_task_1_1_2) == (5, 4, 0)
+
+    def test_children_project_cascade_one_query(self):
+        """
+        Test project cascade writes the subtree with one update, without
+        fetching the project.
+        """
+
+        root = core_models.Task.objects.get(pk=self.ws_1_cat_1_nested_task_1.pk)
+        root.project_id = self.cat_1_pr_1_task_1.project_id
+        core_models.Task.objects.filter(pk=root.pk).update(
+            project_id=root.project_id)
+        with self.assertNumQueries(1):
+            assert root.run_cascade("children_project") == 3
+        assert not core_models.Task.get_descendants([root]).exclude(
+            project_id=root.project_id).exists()
+
+    @override_settings(CASCADE_ASYNC_THRESHOLD=3)
+    def test_cascade_job_for_large_subtree(self):
+        """
+        Test cascade of a subtree above threshold is queued as job and
+        applied in chunks by `run_cascade_jobs` command.
+        """
+
+        root = core_models.Task.objects.get(pk=self.ws_1_cat_1_nested_task_1.pk)
+        root.is_visible = False
+        with self.captureOnCommitCallbacks(execute=True):
+            root.save()
+        [job] = root.cascade_jobs
+        assert job.status == core_models.CascadeJob.Status.PENDING
+        assert job.operations == ["children_project", "children_visibility"]
+        assert job.subtree_size == 4
+        descendants = core_models.Task.get_descendants([root])
+        assert descendants.filter(is_visible=True).count() == 3
+
+        call_command("run_cascade_jobs", chunk_size=2, stdout=StringIO())
+        job.refresh_from_db()
+        assert job.status == core_models.CascadeJob.Status.DONE
+        assert job.processed == 3
+        assert not descendants.filter(is_visible=True).exists()
+
+    @override_settings(CASCADE_ASYNC_THRESHOLD=3)
+    def test_cascade_job_reclaimed_after_lease(self):
+        """
+        Test a running job left by a dead worker is requeued once its lease
+        expired and then completed.
+        """
+
+        root = core_models.Task.objects.get(pk=self.ws_1_cat_1_nested_task_1.pk)
+        root.is_visible = False
+        root.save()
+        [job] = root.cascade_jobs
+        Status = core_models.CascadeJob.Status
+        queryset = core_models.CascadeJob.objects.filter(pk=job.pk)
+        queryset.update(status=Status.RUNNING)
+        call_command("run_cascade_jobs", lease=60, stdout=StringIO())
+        assert queryset.get().status == Status.RUNNING
+
+        queryset.update(updated_at=timezone.now() - dt.timedelta(minutes=2))
+        call_command("run_cascade_jobs", lease=60, stdout=StringIO())
+        job.refresh_from_db()
+        assert job.status == Status.DONE
+        assert not core_models.Task.get_descendants([root]).filter(
+            is_visible=True).exists()
+
+    def test_chunked_delete(self):
+        """
+        Test chunked delete rebases orphaned subtrees and rollups with a
+        fixed number of tree queries per chunk.
+        """
+
+        root = self.ws_1_cat_1_nested_task_1
+        leaves = [self.ws_1_cat_1_nested_task_1_1_1,
+                  self.ws_1_cat_1_nested_task_1_1_2]
+        for task in leaves:
+            task.estimated_effort = 2
+            task.save()
+        queryset = core_models.Task.objects.filter(
+            pk__in=[root.pk, self.ws_1_cat_1_nested_task_1_1.pk])
+        # pks, savepoint, rows, tags, set null, delete, survivors, paths,
+        # rollups, release and the final empty pks
+        with self.assertNumQueries(11):
+            deleted, counts = delete_in_chunks(queryset)
+        assert deleted == 2
+        assert counts == {"core.Task": 2}
+        for task in leaves:
+            task.refresh_from_db()
+            assert task.parent_id is None
+            assert task.tree_path == f'{task.pk:010d}/'
+            assert task.subtree_estimated_effort == 2
+            assert task.descendant_count == 0
+
+    def test_category_delete_syncs_trees_once(self):
+        """
+        Test deleting a category syncs its cascaded tree rows once per
+        model, whatever the number of rows.
+        """
+
+        category = self.ws_1_category_1
+
+        def delete_queries(count):
+            for i in range(count):
+                core_models.Task.objects.create(
+                    title=f'task tmp {i}', workspace=category.workspace,
+                    category=category)
+            with CaptureQueriesContext(connection) as queries:
+                core_models.Category.objects.get(pk=category.pk).delete()
+            transaction.set_rollback(True)
+            return len(queries)
+
+        with transaction.atomic():
+            few = delete_queries(2)
+        with transaction.atomic():
+            many = delete_queries(20)
+        assert few == many
+
+    def test_queryset_delete_rebases_past_higher_pk_ancestor(self):
+        """
+        Test queryset delete of a node and its ancestor of higher pk rebases
+        the surviving subtree past both.
+        """
+
+        category = self.ws_1_category_1
+        values = {"workspace": category.workspace, "category": category}
+        child = core_models.Task.objects.create(title="child tmp", **values)
+        parent = core_models.Task.objects.create(title="parent tmp", **values)
+        child.move_to(parent)
+        grandchild = core_models.Task.objects.create(
+            title="grandchild tmp", parent=child, **values)
+        assert tree_path_pks(grandchild.tree_path) == [
+            parent.pk, child.pk, grandchild.pk]
+        core_models.Task.objects.filter(pk__in=[parent.pk, child.pk]).delete()
+        grandchild.refresh_from_db()
+        assert grandchild.parent_id is None
+        assert grandchild.tree_path == f'{grandchild.pk:010d}/'
+
+    def test_clean_related_rows_batched(self):
+        """
+        Test workspace and parent invariants of a batch are validated from
+        related rows fetched with one query.
+        """
+
+        tasks = list(core_models.Task.objects.filter(pk__in=[
+            self.ws_1_cat_1_nested_task_1_1.pk,
+            self.ws_1_cat_1_nested_task_1_1_1.pk,
+            self.ws_1_cat_2_nested_task_1_1.pk,
+        ]))
+        priority = core_models.Priority.objects.create(
+            name="priority tmp", workspace=self.ws_2_category_2.workspace)
+        tasks[0].priority_id = priority.pk
+        with self.assertNumQueries(1):
+            core_models.Task.prefetch_related_rows(tasks)
+            errors = []
+            for task in tasks:
+                try:
+                    task.clean()
+                except ValidationError as e:
+                    errors.append(str(e))
+        assert len(errors) == 1
+        assert "same workspace as self" in errors[0]
+
+        # unprefetched objects fetch their rows on their own
+        tasks[1].is_visible = not tasks[1].is_visible
+        with self.assertNumQueries(1):
+            with self.assertRaisesMessage(ValidationError, self.msg_visibility):
+                tasks[1].clean()
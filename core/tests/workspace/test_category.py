@@ -1,6 +1,9 @@
+from unittest import mock
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
 from core import models as core_models
+from core.models.custom.delete import delete_in_chunks
+from core.models.custom.mixins import tree_path_pks
 from ..generic_classes import CustomTestCaseSetup
 
 
@@ -205,3 +208,100 @@ class CategoryModelTreeTests(CategoryModelFullSetupTestClass):
             self.ws_1_nested_category_1_1.full_clean()
         except ValidationError as e:
             assert self.msg_parent_attribute in str(e)
+
+    def test_str_from_full_path(self):
+        """
+        Test category display name includes ancestors without queries.
+        """
+
+        category = self.get_category_query(
+            [self.ws_1_nested_category_1_1_1.pk]).get()
+        with self.assertNumQueries(0):
+            display = str(category)
+        assert display == "Nested category 1 --> Nested category 1_1 --> Nested category 1_1_1"
+
+    def test_full_path_on_rename_and_parent_update(self):
+        """
+        Test descendants full path is updated on rename and parent update.
+        """
+
+        self.ws_1_nested_category_1_1.name = "Renamed"
+        self.ws_1_nested_category_1_1.save()
+        category = self.get_category_query(
+            [self.ws_1_nested_category_1_1_2.pk]).get()
+        assert str(category) == "Nested category 1 --> Renamed --> Nested category 1_1_2"
+
+        self.ws_1_nested_category_1_1.parent = None
+        self.ws_1_nested_category_1_1.save()
+        category.refresh_from_db()
+        assert str(category) == "Renamed --> Nested category 1_1_2"
+
+    def test_parent_update_atomic(self):
+        """
+        Test row, tree paths and full paths of a moved category are written
+        together or not at all.
+        """
+
+        category = self.get_category_query(
+            [self.ws_1_nested_category_1_1.pk]).get()
+        category.parent = None
+        with mock.patch.object(core_models.Category, "update_full_path",
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                category.save()
+        for pk, parent_pk in [
+            (self.ws_1_nested_category_1_1.pk, self.ws_1_nested_category_1.pk),
+            (self.ws_1_nested_category_1_1_1.pk,
+             self.ws_1_nested_category_1_1.pk),
+        ]:
+            stored = self.get_category_query([pk]).get()
+            assert stored.parent_id == parent_pk
+            assert tree_path_pks(stored.tree_path)[0] == \
+                self.ws_1_nested_category_1.pk
+
+    def test_get_ancestors_map(self):
+        """
+        Test ancestors of many categories are fetched with one query.
+        """
+
+        categories = self.get_category_query(
+            [self.ws_1_nested_category_1_1_1.pk, self.ws_1_nested_category_1.pk])
+        categories = list(categories)
+        with self.assertNumQueries(1):
+            ancestors = core_models.Category.get_ancestors_map(categories)
+        assert ancestors == {
+            self.ws_1_nested_category_1.pk: [],
+            self.ws_1_nested_category_1_1_1.pk: [
+                self.ws_1_nested_category_1,
+                self.ws_1_nested_category_1_1,
+            ],
+        }
+
+    def test_full_path_on_parent_delete(self):
+        """
+        Test children of deleted category drop it from their paths.
+        """
+
+        core_models.Category.objects.filter(
+            pk=self.ws_1_nested_category_1.pk).delete()
+        category = self.get_category_query(
+            [self.ws_1_nested_category_1_1_1.pk]).get()
+        assert str(category) == "Nested category 1_1 --> Nested category 1_1_1"
+        assert core_models.Category.get_root(category).pk == \
+            self.ws_1_nested_category_1_1.pk
+
+    def test_full_path_on_chunked_delete(self):
+        """
+        Test chunked delete syncs paths of former descendants per chunk.
+        """
+
+        deleted, _ = delete_in_chunks(core_models.Category.objects.filter(
+            pk__in=[self.ws_1_nested_category_1.pk,
+                    self.ws_1_nested_category_1_1.pk],
+        ), chunk_size=1)
+        assert deleted == 2
+        category = self.get_category_query(
+            [self.ws_1_nested_category_1_1_1.pk]).get()
+        assert str(category) == "Nested category 1_1_1"
+        assert category.parent_id is None
+        assert category.tree_path == f'{category.pk:010d}/'
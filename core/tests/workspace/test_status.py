@@ -1,3 +1,4 @@
+from django.contrib import admin
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
 from core import models as core_models
@@ -115,3 +116,24 @@ class StatusModelCleanSaveDeleteTests(StatusModelFullSetupTestClass):
         - validation
         - functionality
     """
+
+    def test_admin_delete_selected_syncs_trees(self):
+        """
+        Test deleting statuses from admin rebases trees of surviving tasks
+        below cascaded ones.
+        """
+
+        category = core_models.Category.objects.create(
+            name="category tmp", workspace=self.workspace_1)
+        values = {"workspace": self.workspace_1, "category": category}
+        parent = core_models.Task.objects.create(
+            title="parent tmp", status=self.ws_1_status_1, **values)
+        child = core_models.Task.objects.create(
+            title="child tmp", parent=parent, **values)
+        model_admin = admin.site._registry[core_models.Status]
+        model_admin.delete_queryset(None, core_models.Status.objects.filter(
+            pk=self.ws_1_status_1.pk))
+        assert not core_models.Task.objects.filter(pk=parent.pk).exists()
+        child.refresh_from_db()
+        assert child.parent_id is None
+        assert child.tree_path == f'{child.pk:010d}/'
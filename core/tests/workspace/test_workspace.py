@@ -148,6 +148,35 @@ class WorkspaceModelCleanSaveDeleteTests(WorkspaceModelFullSetupTestClass):
         self.workspace_1.refresh_from_db()
         self.assertFalse(self.workspace_1.is_default)
 
+    def test_owner_synced_to_workspace_rows(self):
+        """
+        Test denormalized `owner` of workspace rows follows workspace's
+        `created_by` on create, workspace change and owner change.
+        """
+
+        category = core_models.Category.objects.create(
+            name="category tmp", workspace=self.workspace_1)
+        task = core_models.Task.objects.create(
+            title="task tmp", workspace=self.workspace_1, category=category)
+        tag = core_models.Tag.objects.create(
+            name="tag tmp", workspace=self.workspace_1)
+        assert core_models.Task.objects.filter(
+            pk=task.pk, owner=str(self.user.id)).exists()
+
+        user_2 = self.create_user("user-2", "testpassword234")
+        workspace = core_models.Workspace.objects.create(
+            name="Workspace tmp", created_by=user_2.id)
+        tag = core_models.Tag.objects.get(pk=tag.pk)
+        tag.workspace_id = workspace.pk
+        tag.save(update_fields=["workspace"])
+        assert core_models.Tag.objects.get(pk=tag.pk).owner == str(user_2.id)
+
+        self.workspace_1.created_by = user_2.id
+        self.workspace_1.save()
+        for model, pk in [(core_models.Category, category.pk),
+                          (core_models.Task, task.pk)]:
+            assert model.objects.get(pk=pk).owner == str(user_2.id)
+
 
 class WorkspaceModelCleanSaveDeleteIsolatedTests(WorkspaceModelMinimalSetupClass):
     """
@@ -124,6 +124,29 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = '/'
 
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+
+# max number of rendered tree fragments kept in memory by each worker
+TREE_FRAGMENT_CACHE_SIZE = 256
+# cache keeping tree versions, fragments are cached only if it is shared by
+# all workers or `TREE_FRAGMENT_CACHE_ALLOW_LOCAL` is set, see `core.checks`
+TREE_VERSION_CACHE = "default"
+TREE_FRAGMENT_CACHE_ALLOW_LOCAL = env(
+    "TREE_FRAGMENT_CACHE_ALLOW_LOCAL", cast=bool, default=False)
+
+# subtrees of at least this many nodes are propagated by `run_cascade_jobs`
+# in chunks of `CASCADE_CHUNK_SIZE` rows instead of in request
+CASCADE_ASYNC_THRESHOLD = 1000
+CASCADE_CHUNK_SIZE = 500
+# seconds a running job may go without finishing a chunk before it is
+# requeued, longer than any chunk takes
+CASCADE_JOB_LEASE = 600
+
+# max objects deleted per transaction by bulk deletes, see `delete_in_chunks`
+BULK_DELETE_CHUNK_SIZE = 500
+
 # crispy_forms, crispy_bootstrap5
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"